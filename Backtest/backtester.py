@@ -0,0 +1,304 @@
+import argparse
+import contextlib
+import importlib.util
+import itertools
+import os
+import sys
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+# The Trader files import `datamodel` as the exchange does; the local copy lives next to this file
+BACKTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+if BACKTEST_DIR not in sys.path:
+    sys.path.insert(0, BACKTEST_DIR)
+
+from csv_cache import load_csv
+from datamodel import Listing, OrderBatch, OrderDepth, Trade, TradingState
+
+SUBMISSION = "SUBMISSION"
+OBSERVATION_PRODUCTS = ("DOLPHIN_SIGHTINGS",)
+_module_ids = itertools.count()
+
+
+def load_trader(path: str):
+    # Loads the Trader class of a round file as a fresh module. The Traders keep their state in class attributes, so
+    # every backtest needs its own copy of the module to start from a clean state
+    spec = importlib.util.spec_from_file_location("trader_" + str(next(_module_ids)), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Trader()
+
+
+def read_prices(path: str, columns=None, products=None, cache: bool = True) -> pd.DataFrame:
+    # prices_round_N_day_D.csv: one row per product and timestamp, up to 3 levels per side, ask volumes positive.
+    # Parsed once and then loaded from the column cache (see csv_cache.py)
+    if not cache:
+        prices = pd.read_csv(path, sep=";", usecols=columns)
+        return prices if products is None else prices[prices["product"].isin(products)].reset_index(drop=True)
+    return load_csv(path, columns, products)
+
+
+def read_trades(path: str, columns=None, products=None, cache: bool = True) -> pd.DataFrame:
+    # trades_round_N_day_D_*.csv: timestamp;buyer;seller;symbol;currency;price;quantity
+    if not cache:
+        trades = pd.read_csv(path, sep=";", usecols=columns)
+        return trades if products is None else trades[trades["symbol"].isin(products)].reset_index(drop=True)
+    return load_csv(path, columns, products)
+
+
+class BacktestResult:
+    def __init__(self, timestamps, symbols, pnl, positions, own_trades, cancelled, errors, seconds, tick_seconds):
+        self.timestamps = timestamps  # array of the replayed timestamps
+        self.symbols = symbols
+        self.pnl = pnl  # symbol -> array of the marked-to-market PnL at each timestamp
+        self.positions = positions  # symbol -> array of the position at each timestamp
+        self.own_trades = own_trades  # list of all our fills
+        self.cancelled = cancelled  # symbol -> number of ticks where all our orders were cancelled for the limits
+        self.errors = errors  # list of (timestamp, traceback) for the ticks where Trader.run raised
+        self.seconds = seconds
+        self.tick_seconds = tick_seconds  # array of the time spent in Trader.run at each timestamp
+
+    def total_pnl(self):
+        if len(self.symbols) == 0:
+            return np.zeros(len(self.timestamps))
+        return np.sum([self.pnl[symbol] for symbol in self.symbols], axis=0)
+
+    def final_pnl(self):
+        total = self.total_pnl()
+        return float(total[-1]) if len(total) > 0 else 0.0
+
+    def max_drawdown(self):
+        total = self.total_pnl()
+        if len(total) == 0:
+            return 0.0
+        return float(np.max(np.maximum.accumulate(total) - total))
+
+    def summary(self):
+        lines = ["Replayed " + str(len(self.timestamps)) + " timestamps in " + str(round(self.seconds, 2)) + "s"]
+        for symbol in self.symbols:
+            lines.append(symbol + ": PnL " + str(round(float(self.pnl[symbol][-1]), 1)) + ", final position " +
+                         str(int(self.positions[symbol][-1])) + ", cancelled ticks " + str(self.cancelled[symbol]))
+        lines.append("Total PnL: " + str(round(self.final_pnl(), 1)) + ", max drawdown: " +
+                     str(round(self.max_drawdown(), 1)))
+        if self.errors:
+            lines.append(str(len(self.errors)) + " ticks raised, first one at timestamp " + str(self.errors[0][0]) +
+                         ":\n" + self.errors[0][1])
+        return "\n".join(lines)
+
+
+class Backtester:
+    # Deterministic replay of one day of order books (and optionally market trades) through Trader.run.
+    # Orders are first matched against the book of the same timestamp at the book prices, then what is left against
+    # the market trades of that timestamp at our price. As on the exchange, all the orders of a product are cancelled
+    # if they could take the position beyond its limit
+    def __init__(self, trader, prices: pd.DataFrame, trades: pd.DataFrame = None, limits: dict = None,
+                 observation_products=OBSERVATION_PRODUCTS, match_market_trades: bool = True):
+        self.trader = trader
+        self.limits = limits if limits is not None else getattr(trader, "limits", {})
+        self.observation_products = set(observation_products)
+        self.match_market_trades = match_market_trades and trades is not None
+        self.books = self.build_books(prices)
+        self.market_trades = self.build_market_trades(trades) if trades is not None else {}
+
+    def build_books(self, prices: pd.DataFrame):
+        # timestamp -> list of (product, bids, asks, mid_price); one pass over numpy columns, no per-row pandas access
+        prices = prices.sort_values(["timestamp", "product"], kind="stable")
+        timestamps = prices["timestamp"].to_numpy()
+        products = prices["product"].to_numpy()
+        mid_prices = prices["mid_price"].to_numpy(dtype=float)
+        bid_prices = [prices["bid_price_" + str(i)].to_numpy(dtype=float) for i in (1, 2, 3)]
+        bid_volumes = [prices["bid_volume_" + str(i)].to_numpy(dtype=float) for i in (1, 2, 3)]
+        ask_prices = [prices["ask_price_" + str(i)].to_numpy(dtype=float) for i in (1, 2, 3)]
+        ask_volumes = [prices["ask_volume_" + str(i)].to_numpy(dtype=float) for i in (1, 2, 3)]
+
+        books = {}
+        for row in range(len(prices)):
+            bids = []
+            asks = []
+            for level in range(3):
+                if not np.isnan(bid_prices[level][row]):
+                    bids.append((int(bid_prices[level][row]), int(bid_volumes[level][row])))
+                if not np.isnan(ask_prices[level][row]):
+                    asks.append((int(ask_prices[level][row]), int(ask_volumes[level][row])))
+            books.setdefault(int(timestamps[row]), []).append((products[row], bids, asks, mid_prices[row]))
+        return books
+
+    @staticmethod
+    def build_market_trades(trades: pd.DataFrame):
+        # timestamp -> list of Trade
+        market_trades = {}
+        for timestamp, buyer, seller, symbol, price, quantity in zip(
+                trades["timestamp"], trades["buyer"], trades["seller"], trades["symbol"], trades["price"],
+                trades["quantity"]):
+            buyer = "" if pd.isna(buyer) else buyer
+            seller = "" if pd.isna(seller) else seller
+            market_trades.setdefault(int(timestamp), []).append(
+                Trade(symbol, int(price), int(quantity), buyer, seller, int(timestamp)))
+        return market_trades
+
+    def run(self, quiet: bool = True) -> BacktestResult:
+        start = time.perf_counter()
+        timestamps = sorted(self.books.keys())
+        symbols = sorted({product for rows in self.books.values() for product, _, _, _ in rows
+                          if product not in self.observation_products})
+        position = {symbol: 0 for symbol in symbols}
+        cash = {symbol: 0.0 for symbol in symbols}
+        last_mid = {symbol: np.nan for symbol in symbols}
+        cancelled = {symbol: 0 for symbol in symbols}
+        pnl = {symbol: np.zeros(len(timestamps)) for symbol in symbols}
+        positions = {symbol: np.zeros(len(timestamps)) for symbol in symbols}
+        all_own_trades = []
+        own_trades = {}
+        previous_market_trades = {}
+        errors = []
+        tick_seconds = np.zeros(len(timestamps))
+
+        with open(os.devnull, "w") as devnull, \
+                (contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()):
+            for i, timestamp in enumerate(timestamps):
+                listings = {}
+                order_depths = {}
+                observations = {}
+                for product, bids, asks, mid_price in self.books[timestamp]:
+                    listings[product] = Listing(product, product, "SEASHELLS")
+                    order_depth = OrderDepth()
+                    if product in self.observation_products:
+                        observations[product] = int(mid_price) if float(mid_price).is_integer() else mid_price
+                    else:
+                        for price, volume in bids:
+                            order_depth.buy_orders[price] = volume
+                        for price, volume in asks:
+                            order_depth.sell_orders[price] = -volume
+                        if not np.isnan(mid_price):
+                            last_mid[product] = mid_price
+                    order_depths[product] = order_depth
+
+                state = TradingState(timestamp, listings, order_depths, own_trades, previous_market_trades,
+                                     {symbol: qty for symbol, qty in position.items() if qty != 0}, observations)
+                tick_start = time.perf_counter()
+                try:
+                    result = self.trader.run(state) or {}
+                except Exception:  # the exchange drops the orders of a tick that raises; so do we
+                    result = {}
+                    errors.append((timestamp, traceback.format_exc()))
+                tick_seconds[i] = time.perf_counter() - tick_start
+
+                # The trader may have altered the order depths it received; matching is done on a clean copy
+                own_trades = {}
+                tick_market_trades = self.market_trades.get(timestamp, [])
+                for symbol, orders in result.items():
+                    if symbol not in position or not orders:
+                        continue
+                    if not self.within_limits(symbol, orders, position[symbol]):
+                        cancelled[symbol] += 1
+                        continue
+                    fills = self.match_orders(symbol, orders, self.books[timestamp], tick_market_trades, timestamp)
+                    for trade in fills:
+                        if trade.buyer == SUBMISSION:
+                            position[symbol] += trade.quantity
+                            cash[symbol] -= trade.price * trade.quantity
+                        else:
+                            position[symbol] -= trade.quantity
+                            cash[symbol] += trade.price * trade.quantity
+                    if fills:
+                        own_trades[symbol] = fills
+                        all_own_trades.extend(fills)
+
+                previous_market_trades = {}
+                for trade in tick_market_trades:
+                    previous_market_trades.setdefault(trade.symbol, []).append(trade)
+
+                for symbol in symbols:
+                    mark = last_mid[symbol] if not np.isnan(last_mid[symbol]) else 0.0
+                    pnl[symbol][i] = cash[symbol] + position[symbol] * mark
+                    positions[symbol][i] = position[symbol]
+
+        return BacktestResult(np.array(timestamps), symbols, pnl, positions, all_own_trades, cancelled, errors,
+                              time.perf_counter() - start, tick_seconds)
+
+    def within_limits(self, symbol, orders, current_position):
+        limit = self.limits.get(symbol)
+        if limit is None:
+            return True
+        if isinstance(orders, OrderBatch):
+            total_buy = orders.total_buy()
+            total_sell = orders.total_sell()
+        else:
+            total_buy = sum(order.quantity for order in orders if order.quantity > 0)
+            total_sell = sum(order.quantity for order in orders if order.quantity < 0)
+        return current_position + total_buy <= limit and current_position + total_sell >= -limit
+
+    def match_orders(self, symbol, orders, book_rows, market_trades, timestamp):
+        bids = []
+        asks = []
+        for product, product_bids, product_asks, _ in book_rows:
+            if product == symbol:
+                bids = sorted(([price, volume] for price, volume in product_bids), reverse=True)
+                asks = sorted([price, volume] for price, volume in product_asks)
+                break
+        trades_left = [[trade.price, trade.quantity] for trade in market_trades if trade.symbol == symbol]
+
+        fills = []
+        for order in orders:
+            quantity = int(abs(order.quantity))
+            if order.quantity > 0:
+                # Buying: we lift the asks priced at or below our price
+                for level in asks:
+                    if quantity == 0 or level[0] > order.price:
+                        break
+                    volume = min(quantity, level[1])
+                    if volume > 0:
+                        fills.append(Trade(symbol, level[0], volume, SUBMISSION, "", timestamp))
+                        level[1] -= volume
+                        quantity -= volume
+                if self.match_market_trades:
+                    for trade in trades_left:
+                        if quantity == 0:
+                            break
+                        if trade[0] <= order.price and trade[1] > 0:
+                            volume = min(quantity, trade[1])
+                            fills.append(Trade(symbol, int(order.price), volume, SUBMISSION, "", timestamp))
+                            trade[1] -= volume
+                            quantity -= volume
+            elif order.quantity < 0:
+                # Selling: we hit the bids priced at or above our price
+                for level in bids:
+                    if quantity == 0 or level[0] < order.price:
+                        break
+                    volume = min(quantity, level[1])
+                    if volume > 0:
+                        fills.append(Trade(symbol, level[0], volume, "", SUBMISSION, timestamp))
+                        level[1] -= volume
+                        quantity -= volume
+                if self.match_market_trades:
+                    for trade in trades_left:
+                        if quantity == 0:
+                            break
+                        if trade[0] >= order.price and trade[1] > 0:
+                            volume = min(quantity, trade[1])
+                            fills.append(Trade(symbol, int(order.price), volume, "", SUBMISSION, timestamp))
+                            trade[1] -= volume
+                            quantity -= volume
+        return fills
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a day of Prosperity data through a Trader file")
+    parser.add_argument("algorithm", help="path to the file defining the Trader class")
+    parser.add_argument("prices", help="prices_round_N_day_D.csv")
+    parser.add_argument("trades", nargs="?", default=None, help="trades_round_N_day_D_*.csv (optional)")
+    parser.add_argument("--verbose", action="store_true", help="let the Trader print to stdout")
+    args = parser.parse_args()
+
+    trader = load_trader(args.algorithm)
+    prices = read_prices(args.prices)
+    trades = read_trades(args.trades) if args.trades else None
+    result = Backtester(trader, prices, trades).run(quiet=not args.verbose)
+    print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
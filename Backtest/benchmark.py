@@ -0,0 +1,67 @@
+import argparse
+
+import numpy as np
+
+from backtester import Backtester, load_trader, read_prices, read_trades
+
+# Per-tick latency of Trader.run over a replayed day, with the Trader's diagnostics off and then on. The Trader file
+# must define a `Diagnostics` class and a `diagnostics` attribute (see Round_5/Final/Round5PerBana.py). Traders that
+# dispatch their strategies from a registry also report the time spent in each of them (`handler_report`), and the
+# share of params["tick_budget"] used by the slowest tick
+
+
+def latency_stats(tick_seconds):
+    # microseconds
+    micros = np.asarray(tick_seconds) * 1e6
+    return {"mean": float(np.mean(micros)), "p50": float(np.percentile(micros, 50)),
+            "p99": float(np.percentile(micros, 99)), "max": float(np.max(micros))}
+
+
+def run_with_diagnostics(algorithm: str, prices, trades, level: str, subsystems=None):
+    trader = load_trader(algorithm)
+    diagnostics_class = type(trader.diagnostics)
+    trader.diagnostics = diagnostics_class(getattr(diagnostics_class, level), subsystems)
+    # stdout is redirected to devnull by the backtester: the messages are still formatted and written
+    return trader, Backtester(trader, prices, trades).run(quiet=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tick latency of a Trader with its diagnostics off and on")
+    parser.add_argument("algorithm", help="path to the file defining the Trader class")
+    parser.add_argument("prices", help="prices_round_N_day_D.csv")
+    parser.add_argument("trades", nargs="?", default=None, help="trades_round_N_day_D_*.csv (optional)")
+    parser.add_argument("--level", default="DEBUG", help="level of the diagnostics for the 'on' run")
+    parser.add_argument("--subsystem", action="append", default=None,
+                        help="only enable these subsystems for the 'on' run; repeat for several")
+    args = parser.parse_args()
+
+    prices = read_prices(args.prices)
+    trades = read_trades(args.trades) if args.trades else None
+    rows = [("off", run_with_diagnostics(args.algorithm, prices, trades, "OFF")),
+            ("on", run_with_diagnostics(args.algorithm, prices, trades, args.level, args.subsystem))]
+
+    print("diagnostics      mean(us)     p50(us)     p99(us)     max(us)      PnL")
+    for name, (_, result) in rows:
+        stats = latency_stats(result.tick_seconds)
+        print(name.ljust(12) + "".join([str(round(stats[key], 1)).rjust(12) for key in ("mean", "p50", "p99", "max")]) +
+              str(round(result.final_pnl(), 1)).rjust(10))
+
+    trader = rows[0][1][0]
+    budget = getattr(trader, "params", {}).get("tick_budget")
+    if budget is not None:
+        # The strategies that are not must_run get skipped once a tick runs past the budget
+        print()
+        print("tick budget: " + str(round(budget * 1e3, 1)) + "ms, slowest tick used " +
+              ", ".join([str(round(100 * max(result.tick_seconds) / budget, 1)) + "% (" + name + ")"
+                         for name, (_, result) in rows]))
+
+    if hasattr(trader, "handler_report"):
+        print()
+        print("handler (off)       calls    mean(us)    memo hits  skipped")
+        for name, report in trader.handler_report().items():
+            print(name.ljust(16) + str(report["calls"]).rjust(8) + str(round(report["mean_us"], 1)).rjust(12) +
+                  str(round(report["memo_hit_rate"], 2)).rjust(13) + str(report["skipped"]).rjust(9))
+
+
+if __name__ == "__main__":
+    main()
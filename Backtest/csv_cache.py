@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Cache of the semicolon separated price and trade CSVs of the exchange: each file is parsed once into one .npy file per
+# column, in a directory named after the hash of its content, and the next loads memory-map the columns instead of
+# parsing the text again. Text columns (product, buyer, ...) are stored as integer codes into their sorted values
+# (-1 for missing), and the rows are grouped by product, in the order of the file within a product, so the rows of
+# one product are a slice of every column. The order of the file is kept in the "row" array to restore it
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get("PROSPERITY_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "prosperity_csv"))
+PRODUCT_COLUMNS = ("product", "symbol")  # prices files have a "product" column, trades files a "symbol" one
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_cache(path: str, directory: str):
+    frame = pd.read_csv(path, sep=";")
+    product_column = next((name for name in PRODUCT_COLUMNS if name in frame.columns), None)
+    meta = {"version": CACHE_VERSION, "source": os.path.basename(path), "rows": len(frame),
+            "columns": list(frame.columns), "categories": {}, "text_dtypes": {}, "product_column": product_column,
+            "products": {}}
+
+    order = np.arange(len(frame))
+    if product_column is not None:
+        codes, products = pd.factorize(frame[product_column], sort=True)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(products) + 1))
+        meta["products"] = {product: [int(bounds[i]), int(bounds[i + 1])] for i, product in enumerate(products)}
+
+    # Written next to the final directory and renamed at the end, so that a concurrent load (the workers of sweep.py)
+    # never sees a half written cache
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+    try:
+        np.save(os.path.join(staging, "row.npy"), order)
+        for name in frame.columns:
+            values = frame[name]
+            if not pd.api.types.is_numeric_dtype(values):
+                codes, categories = pd.factorize(values, sort=True)
+                meta["categories"][name] = categories.tolist()
+                meta["text_dtypes"][name] = str(values.dtype)  # object, or str from pandas 3
+                values = codes.astype(np.int32)
+            else:
+                values = values.to_numpy()
+            np.save(os.path.join(staging, name + ".npy"), values[order])
+        with open(os.path.join(staging, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        try:
+            os.rename(staging, directory)
+        except OSError:  # built by someone else in the meantime
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+class CachedTable:
+    # The cached columns of one CSV. Columns are memory-mapped: the whole column, or the rows of one product, come
+    # without any copy; several products are concatenated
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        self.columns = meta["columns"]
+        self.categories = meta["categories"]
+        self.text_dtypes = meta["text_dtypes"]
+        self.product_column = meta["product_column"]
+        self.products = {product: tuple(bounds) for product, bounds in meta["products"].items()}
+        self.rows = meta["rows"]
+
+    def __len__(self):
+        return self.rows
+
+    def raw(self, name: str, products=None):
+        # Stored values of a column (the codes for a text column), grouped by product
+        array = np.load(os.path.join(self.directory, name + ".npy"), mmap_mode="r")
+        if products is None:
+            return array
+        if isinstance(products, str):
+            products = [products]
+        slices = [slice(*self.products[product]) for product in products if product in self.products]
+        if len(slices) == 1:
+            return array[slices[0]]
+        return np.concatenate([array[part] for part in slices]) if slices else array[:0]
+
+    def column(self, name: str, products=None):
+        # Values of a column, the text ones decoded (missing values are nan)
+        values = self.raw(name, products)
+        if name in self.categories:
+            categories = np.array(self.categories[name] + [np.nan], dtype=object)
+            return categories[values]  # code -1 picks the nan at the end
+        return values
+
+    def to_frame(self, columns=None, products=None) -> pd.DataFrame:
+        # Same frame as pd.read_csv(path, sep=";") restricted to the columns and products, in the order of the file
+        order = np.argsort(self.raw("row", products), kind="stable")
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: pd.Series(np.asarray(self.column(name, products))[order],
+                                             dtype=self.text_dtypes.get(name)) for name in columns})
+
+
+def load_table(path: str, cache_dir: str = None) -> CachedTable:
+    directory = os.path.join(cache_dir or DEFAULT_CACHE_DIR, file_hash(path) + "-v" + str(CACHE_VERSION))
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        build_cache(path, directory)
+    return CachedTable(directory)
+
+
+def load_csv(path: str, columns=None, products=None, cache_dir: str = None) -> pd.DataFrame:
+    return load_table(path, cache_dir).to_frame(columns, products)
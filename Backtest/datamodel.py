@@ -0,0 +1,175 @@
+import json
+from typing import Dict, List
+from json import JSONEncoder
+
+import numpy as np
+
+# Local copy of the datamodel the exchange provides to the algorithms, so the Trader files can be replayed offline.
+# Same classes and attributes as the exchange's, declared with __slots__: the Traders allocate thousands of Orders per
+# tick and the replay as many Trades and OrderDepths, and slotted objects are smaller and faster to create
+
+Time = int
+Symbol = str
+Product = str
+Position = int
+UserId = str
+Observation = int
+
+
+class Listing:
+    __slots__ = ("symbol", "product", "denomination")
+
+    def __init__(self, symbol: Symbol, product: Product, denomination: Product):
+        self.symbol = symbol
+        self.product = product
+        self.denomination = denomination
+
+
+class Order:
+    __slots__ = ("symbol", "price", "quantity")
+
+    def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+
+    def __str__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+
+    def __repr__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+
+
+class OrderBatch:
+    # Orders of one symbol held as two numpy arrays instead of one Order object each. A Trader can return a batch in
+    # place of a list of Orders: iterating it yields Orders, and the backtester reads the arrays directly
+    __slots__ = ("symbol", "prices", "quantities")
+
+    def __init__(self, symbol: Symbol, prices, quantities) -> None:
+        self.symbol = symbol
+        self.prices = np.asarray(prices, dtype=np.int64)
+        self.quantities = np.asarray(quantities, dtype=np.int64)
+        if self.prices.shape != self.quantities.shape:
+            raise ValueError("prices and quantities must have the same length")
+
+    @classmethod
+    def from_orders(cls, symbol: Symbol, orders: List[Order]):
+        return cls(symbol, [order.price for order in orders], [order.quantity for order in orders])
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __iter__(self):
+        for price, quantity in zip(self.prices.tolist(), self.quantities.tolist()):
+            yield Order(self.symbol, price, quantity)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def total_buy(self):
+        return int(self.quantities[self.quantities > 0].sum())
+
+    def total_sell(self):
+        return int(self.quantities[self.quantities < 0].sum())
+
+    def to_orders(self) -> List[Order]:
+        return list(self)
+
+
+class OrderDepth:
+    __slots__ = ("buy_orders", "sell_orders")
+
+    def __init__(self):
+        self.buy_orders: Dict[int, int] = {}
+        self.sell_orders: Dict[int, int] = {}
+
+
+class Trade:
+    __slots__ = ("symbol", "price", "quantity", "buyer", "seller", "timestamp")
+
+    def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None,
+                 timestamp: int = 0) -> None:
+        self.symbol = symbol
+        self.price: int = price
+        self.quantity: int = quantity
+        self.buyer = buyer
+        self.seller = seller
+        self.timestamp = timestamp
+
+    def __str__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.buyer) + " << " + str(self.seller) + ", " + str(self.price) + \
+               ", " + str(self.quantity) + ", " + str(self.timestamp) + ")"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class TradingState(object):
+    __slots__ = ("timestamp", "listings", "order_depths", "own_trades", "market_trades", "position", "observations")
+
+    def __init__(self,
+                 timestamp: Time,
+                 listings: Dict[Symbol, Listing],
+                 order_depths: Dict[Symbol, OrderDepth],
+                 own_trades: Dict[Symbol, List[Trade]],
+                 market_trades: Dict[Symbol, List[Trade]],
+                 position: Dict[Product, Position],
+                 observations: Dict[Product, Observation]):
+        self.timestamp = timestamp
+        self.listings = listings
+        self.order_depths = order_depths
+        self.own_trades = own_trades
+        self.market_trades = market_trades
+        self.position = position
+        self.observations = observations
+
+    def toJSON(self):
+        return json.dumps(state_to_dict(self), sort_keys=True)
+
+
+def _trades_to_dicts(trades: Dict[Symbol, List[Trade]]):
+    return {symbol: [{"symbol": trade.symbol, "price": trade.price, "quantity": trade.quantity, "buyer": trade.buyer,
+                      "seller": trade.seller, "timestamp": trade.timestamp} for trade in symbol_trades]
+            for symbol, symbol_trades in trades.items()}
+
+
+def _trades_to_rows(trades: Dict[Symbol, List[Trade]]):
+    return {symbol: [[trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp]
+                     for trade in symbol_trades] for symbol, symbol_trades in trades.items()}
+
+
+def state_to_dict(state: TradingState, trades_to_plain=_trades_to_dicts):
+    # The structure the exchange's encoder produces from the __dict__ of every object, built directly: the json
+    # encoder then never has to call back into Python for our objects
+    return {"timestamp": state.timestamp,
+            "listings": {symbol: {"symbol": listing.symbol, "product": listing.product,
+                                  "denomination": listing.denomination} for symbol, listing in state.listings.items()},
+            "order_depths": {symbol: {"buy_orders": depth.buy_orders, "sell_orders": depth.sell_orders}
+                             for symbol, depth in state.order_depths.items()},
+            "own_trades": trades_to_plain(state.own_trades),
+            "market_trades": trades_to_plain(state.market_trades),
+            "position": state.position,
+            "observations": state.observations}
+
+
+_compact_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode_state(state: TradingState) -> str:
+    # Compact encoding for logs and replays, about twice as fast as toJSON: no whitespace, keys left in insertion
+    # order, and trades as [symbol, price, quantity, buyer, seller, timestamp] rows
+    return _compact_encoder.encode(state_to_dict(state, _trades_to_rows))
+
+
+class ProsperityEncoder(JSONEncoder):
+    # Encodes the objects of the datamodel as the dicts of their attributes, like the exchange's encoder does with
+    # __dict__; the slotted classes have none, their attributes are read from the slots
+    def default(self, o):
+        if isinstance(o, OrderBatch):
+            return list(o)
+        if isinstance(o, np.generic):
+            return o.item()
+        slots = getattr(type(o), "__slots__", None)
+        if slots is not None:
+            return {slot: getattr(o, slot) for slot in slots}
+        return o.__dict__
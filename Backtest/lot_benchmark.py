@@ -0,0 +1,72 @@
+import argparse
+import importlib.util
+import time
+
+# Time taken to book our fills with the LotQueue of Testing/TradingAlgor2_calculate_shells.py against the per-unit loop
+# it replaced, which pushed or popped one price per unit traded. Fills alternate between buys and sells of the same
+# size, so each one clears the lot opened by the previous fill: the worst case of the per-unit loop
+
+
+def load_lot_queue(path: str):
+    spec = importlib.util.spec_from_file_location("calculate_shells", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.LotQueue
+
+
+def per_unit_fills(fills):
+    # The previous process_trades: one list operation per unit, the most recent price matched first
+    position, prices, seashells = 0, [], 0
+    for price, quantity in fills:
+        for i in range(abs(quantity)):
+            if quantity > 0:
+                if position >= 0:
+                    prices.append(price)
+                else:
+                    seashells += prices.pop(-1) - price
+                position += 1
+            else:
+                if position <= 0:
+                    prices.append(price)
+                else:
+                    seashells += price - prices.pop(-1)
+                position -= 1
+    return seashells
+
+
+def lot_fills(lot_queue_class, fills):
+    lots = lot_queue_class("lifo")
+    return sum(lots.fill(price, quantity) for price, quantity in fills)
+
+
+def best_time(function, *args, repeat: int = 5):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking fills per unit against (price, quantity) lots")
+    parser.add_argument("--algorithm", default="Testing/TradingAlgor2_calculate_shells.py",
+                        help="path to the file defining LotQueue")
+    parser.add_argument("--fills", type=int, default=2000, help="number of fills per size")
+    parser.add_argument("--size", type=int, action="append", default=None, help="units per fill; repeat for several")
+    args = parser.parse_args()
+
+    lot_queue_class = load_lot_queue(args.algorithm)
+    print("units    per unit(ms)    lots(ms)   speedup")
+    for size in args.size or [10, 100, 300, 600, 1200]:
+        fills = [(10000 + i % 7, size if i % 2 == 0 else -size) for i in range(args.fills)]
+        if per_unit_fills(fills) != lot_fills(lot_queue_class, fills):
+            raise AssertionError("Both bookings should realize the same PnL")
+        per_unit = best_time(per_unit_fills, fills)
+        lots = best_time(lot_fills, lot_queue_class, fills)
+        print(str(size).ljust(6) + str(round(per_unit * 1e3, 2)).rjust(15) + str(round(lots * 1e3, 2)).rjust(12) +
+              str(round(per_unit / lots, 1)).rjust(10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+
+import pandas as pd
+
+from backtester import Backtester, load_trader, read_prices, read_trades
+
+# Parameter sweep over the tunable constants a Trader declares in its `params` class attribute. Every configuration
+# is replayed on every day in a pool of worker processes; each worker parses the CSVs once, in its initializer
+
+_days = []  # (name, prices, trades) loaded in each worker
+
+
+def grid(space: dict):
+    # Every combination of the values listed for each parameter
+    names = list(space.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[space[name] for name in names])]
+
+
+def random_search(space: dict, n: int, seed: int = 0):
+    # n configurations drawn at random: a list is sampled from, a (low, high) tuple drawn uniformly (integers stay
+    # integers)
+    generator = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = generator.randint(low, high)
+                else:
+                    config[name] = generator.uniform(low, high)
+            else:
+                config[name] = generator.choice(values)
+        configs.append(config)
+    return configs
+
+
+def _load_days(day_paths):
+    global _days
+    _days = []
+    for prices_path, trades_path in day_paths:
+        prices = read_prices(prices_path)
+        trades = read_trades(trades_path) if trades_path else None
+        _days.append((os.path.basename(prices_path), prices, trades))
+
+
+def _run_config(job):
+    algorithm, config = job
+    row = dict(config)
+    total_pnl = 0.0
+    worst_drawdown = 0.0
+    for name, prices, trades in _days:
+        trader = load_trader(algorithm)
+        unknown = set(config) - set(trader.params)
+        if unknown:
+            raise KeyError("Unknown parameters for " + algorithm + ": " + ", ".join(sorted(unknown)))
+        trader.params = {**trader.params, **config}
+        result = Backtester(trader, prices, trades).run()
+        row["pnl_" + name] = result.final_pnl()
+        row["drawdown_" + name] = result.max_drawdown()
+        total_pnl += result.final_pnl()
+        worst_drawdown = max(worst_drawdown, result.max_drawdown())
+    row["pnl"] = total_pnl
+    row["max_drawdown"] = worst_drawdown
+    return row
+
+
+def sweep(algorithm: str, day_paths, configs, processes: int = None) -> pd.DataFrame:
+    # day_paths: list of (prices csv, trades csv or None). Returns one row per configuration, best PnL first
+    jobs = [(algorithm, config) for config in configs]
+    with multiprocessing.Pool(processes or os.cpu_count(), initializer=_load_days, initargs=(day_paths,)) as pool:
+        rows = pool.map(_run_config, jobs, chunksize=1)
+    return pd.DataFrame(rows).sort_values("pnl", ascending=False).reset_index(drop=True)
+
+
+def _parse_value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the params of a Trader over replayed days")
+    parser.add_argument("algorithm", help="path to the file defining the Trader class")
+    parser.add_argument("--day", action="append", required=True,
+                        help="prices csv, optionally followed by ':' and the trades csv; repeat for several days")
+    parser.add_argument("--param", action="append", default=[],
+                        help="name=v1,v2,... for a list of values or name=low:high for a range (random search)")
+    parser.add_argument("--random", type=int, default=0, help="number of random configurations instead of a grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--output", default=None, help="csv file to save the results to")
+    args = parser.parse_args()
+
+    space = {}
+    for param in args.param:
+        name, values = param.split("=", 1)
+        if ":" in values:
+            low, high = values.split(":", 1)
+            space[name] = (_parse_value(low), _parse_value(high))
+        else:
+            space[name] = [_parse_value(value) for value in values.split(",")]
+    if args.random:
+        configs = random_search(space, args.random, args.seed)
+    else:
+        if any(isinstance(values, tuple) for values in space.values()):
+            parser.error("ranges need --random")
+        configs = grid(space)
+
+    day_paths = []
+    for day in args.day:
+        prices_path, _, trades_path = day.partition(":")
+        day_paths.append((prices_path, trades_path or None))
+
+    results = sweep(args.algorithm, day_paths, configs, args.processes)
+    print(results.to_string())
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
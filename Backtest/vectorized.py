@@ -0,0 +1,182 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtester import read_prices
+from sweep import _parse_value, grid, random_search
+
+# Vectorized backtest of trading signals on whole days of level 1 prices, to screen thousands of thresholds at once
+# instead of replaying Trader.run tick by tick. A strategy maps the prices of a day and a grid of parameters (each an
+# array of shape (configs, 1)) to the target position of each of its products, of shape (configs, timestamps).
+# Targets are rounded and clipped to the position limits, every change of position is filled at the touch (the ask
+# when buying, the bid when selling) and the PnL is marked to the mid price. Fills take any volume by default, or only
+# the volume at the touch with touch_volume=True. Our orders never rest in the book and the deeper levels are not
+# walked: the results rank the parameters, the replay of Trader.run (backtester.py) gives the PnL to expect
+
+LIMITS = {"PEARLS": 20, "BANANAS": 20, "COCONUTS": 600, "PINA_COLADAS": 300, "BERRIES": 250, "DIVING_GEAR": 50,
+          "BAGUETTE": 150, "DIP": 300, "UKULELE": 70, "PICNIC_BASKET": 70}
+BASKET_WEIGHTS = {"BAGUETTE": 2, "DIP": 4, "UKULELE": 1}
+DAY_COLUMNS = ["timestamp", "product", "bid_price_1", "bid_volume_1", "ask_price_1", "ask_volume_1", "mid_price"]
+
+
+def load_day(prices: pd.DataFrame, products=None):
+    # "timestamp": sorted timestamps of the day, and product -> {"bid", "ask", "bid_volume", "ask_volume", "mid"}
+    # arrays aligned on them. A side missing from the book keeps its last quote
+    if products is not None:
+        prices = prices[prices["product"].isin(products)]
+    timestamps = np.sort(prices["timestamp"].unique())
+    day = {"timestamp": timestamps}
+    for product, rows in prices.groupby("product"):
+        rows = rows.set_index("timestamp").reindex(timestamps).ffill()
+        day[product] = {"bid": rows["bid_price_1"].to_numpy(dtype=float),
+                        "ask": rows["ask_price_1"].to_numpy(dtype=float),
+                        "bid_volume": rows["bid_volume_1"].fillna(0).to_numpy(dtype=float),
+                        "ask_volume": rows["ask_volume_1"].fillna(0).abs().to_numpy(dtype=float),
+                        "mid": rows["mid_price"].to_numpy(dtype=float)}
+    return day
+
+
+def hold(events):
+    # events: (configs, timestamps) array of the position to take (+1/-1 to enter, 0 to exit) or nan to keep the
+    # current one. Returns the position at each timestamp, flat before the first event
+    steps = np.arange(1, events.shape[1] + 1)
+    last_event = np.maximum.accumulate(np.where(np.isnan(events), 0, steps), axis=1)
+    state = np.take_along_axis(events, np.maximum(last_event - 1, 0), axis=1)
+    return np.where(last_event > 0, state, 0.0)
+
+
+def simulate(targets, quotes, limit: int, touch_volume: bool = False):
+    # targets: (configs, timestamps) target positions of one product. Returns the positions and the marked-to-market
+    # PnL, both (configs, timestamps)
+    targets = np.clip(np.rint(np.nan_to_num(targets)), -limit, limit)
+    if touch_volume:
+        # Only path that depends on the previous positions: one step per timestamp, all the configs at once
+        positions = np.empty_like(targets)
+        position = np.zeros(targets.shape[0])
+        for t in range(targets.shape[1]):
+            position = position + np.clip(targets[:, t] - position, -quotes["bid_volume"][t], quotes["ask_volume"][t])
+            positions[:, t] = position
+    else:
+        positions = targets
+    trades = np.diff(positions, axis=1, prepend=0)
+    fill_prices = np.where(trades > 0, quotes["ask"], quotes["bid"])
+    cash = -np.cumsum(np.where(trades != 0, trades * fill_prices, 0), axis=1)
+    return positions, cash + positions * quotes["mid"]
+
+
+def ratio_strategy(day, params):
+    # COCONUTS / PINA_COLADAS (see get_orders_coco_pina): short PINA_COLADAS and long COCONUTS when PC / COCO is above
+    # ratio_upper, the other way below ratio_lower, flat again within ratio_exit of ratio_fair
+    ratio = day["PINA_COLADAS"]["mid"] / day["COCONUTS"]["mid"]
+    events = np.where(ratio > params["ratio_upper"], -1.0,
+                      np.where(ratio < params["ratio_lower"], 1.0,
+                               np.where(np.abs(ratio - params["ratio_fair"]) < params["ratio_exit"], 0.0, np.nan)))
+    state = hold(events)
+    return {"PINA_COLADAS": state * params["ratio_size"],
+            "COCONUTS": -state * params["ratio_size"] * params["ratio_fair"]}
+
+
+def spread_strategy(day, params):
+    # PICNIC_BASKET against 2 BAGUETTE + 4 DIP + 1 UKULELE (see get_orders_basket): short the basket when the log
+    # spread to its replication is above basket_short_band, long below basket_long_band, holding in between
+    synthetic = sum(weight * day[symbol]["mid"] for symbol, weight in BASKET_WEIGHTS.items())
+    spread = np.log(day["PICNIC_BASKET"]["mid"]) - np.log(synthetic)
+    events = np.where(spread > params["basket_short_band"], -1.0,
+                      np.where(spread < params["basket_long_band"], 1.0, np.nan))
+    state = hold(events)
+    targets = {"PICNIC_BASKET": state * params["basket_units"]}
+    for symbol, weight in BASKET_WEIGHTS.items():
+        targets[symbol] = -state * params["basket_units"] * weight
+    return targets
+
+
+def jump_strategy(day, params):
+    # DIVING_GEAR (see get_orders_diving_gear): long after the dolphin sightings jump up by at least
+    # gear_jump_threshold (inclusive, as in the Trader), short after they jump down by as much, flat again
+    # gear_jump_cooldown after the last jump
+    timestamps = day["timestamp"]
+    sightings = day["DOLPHIN_SIGHTINGS"]["mid"]
+    change = np.diff(sightings, prepend=sightings[0])
+    direction = np.where(change >= params["gear_jump_threshold"], 1.0,
+                         np.where(change <= -params["gear_jump_threshold"], -1.0, np.nan))
+    state = hold(direction)
+    jump_times = hold(np.where(np.isnan(direction), np.nan, timestamps))
+    expired = timestamps - jump_times >= params["gear_jump_cooldown"]
+    return {"DIVING_GEAR": np.where(expired, 0.0, state) * params["gear_size"]}
+
+
+# name -> (strategy, default parameters)
+STRATEGIES = {"ratio": (ratio_strategy, {"ratio_upper": 1.8809, "ratio_lower": 1.8721, "ratio_fair": 1.8762,
+                                         "ratio_exit": 0.001, "ratio_size": 300}),
+              "spread": (spread_strategy, {"basket_short_band": 0.0075, "basket_long_band": 0.0025,
+                                           "basket_units": 70}),
+              "jump": (jump_strategy, {"gear_jump_threshold": 10, "gear_jump_cooldown": 10000, "gear_size": 50})}
+
+
+def score(days, strategy: str, configs, touch_volume: bool = False, limits: dict = None) -> pd.DataFrame:
+    # days: list of (name, load_day(...)). Every configuration on every day in one pass per day; returns one row per
+    # configuration with its parameters, PnL and max drawdown (summed and worst over the days), best PnL first
+    function, defaults = STRATEGIES[strategy]
+    limits = limits if limits is not None else LIMITS
+    unknown = set().union(*configs) - set(defaults)
+    if unknown:
+        raise KeyError("Unknown parameters for " + strategy + ": " + ", ".join(sorted(unknown)))
+    params = {name: np.array([config.get(name, default) for config in configs], dtype=float)[:, None]
+              for name, default in defaults.items()}
+
+    results = pd.DataFrame({name: values[:, 0] for name, values in params.items()})
+    results["pnl"] = 0.0
+    results["max_drawdown"] = 0.0
+    for name, day in days:
+        total = np.zeros((len(configs), len(day["timestamp"])))
+        for product, targets in function(day, params).items():
+            targets = np.broadcast_to(targets, total.shape)
+            _, pnl = simulate(targets, day[product], limits[product], touch_volume)
+            results["pnl_" + product + "_" + name] = pnl[:, -1]
+            total += pnl
+        drawdown = np.max(np.maximum.accumulate(total, axis=1) - total, axis=1)
+        results["pnl_" + name] = total[:, -1]
+        results["drawdown_" + name] = drawdown
+        results["pnl"] += total[:, -1]
+        results["max_drawdown"] = np.maximum(results["max_drawdown"], drawdown)
+    return results.sort_values("pnl", ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a grid of signal parameters on whole days of prices at once")
+    parser.add_argument("prices", nargs="+", help="prices_round_N_day_D.csv; several for several days")
+    parser.add_argument("--strategy", required=True, choices=sorted(STRATEGIES))
+    parser.add_argument("--param", action="append", default=[],
+                        help="name=v1,v2,... for a list of values or name=low:high for a range (random search)")
+    parser.add_argument("--random", type=int, default=0, help="number of random configurations instead of a grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--touch-volume", action="store_true", help="only fill the volume at the touch")
+    parser.add_argument("--output", default=None, help="csv file to save the results to")
+    args = parser.parse_args()
+
+    space = {}
+    for param in args.param:
+        name, values = param.split("=", 1)
+        if ":" in values:
+            low, high = values.split(":", 1)
+            space[name] = (_parse_value(low), _parse_value(high))
+        else:
+            space[name] = [_parse_value(value) for value in values.split(",")]
+    if args.random:
+        configs = random_search(space, args.random, args.seed)
+    else:
+        if any(isinstance(values, tuple) for values in space.values()):
+            parser.error("ranges need --random")
+        configs = grid(space)
+
+    days = [(os.path.basename(path), load_day(read_prices(path, columns=DAY_COLUMNS))) for path in args.prices]
+    results = score(days, args.strategy, configs, args.touch_volume)
+    print(results.to_string())
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,66 @@ import math as mt
 from datamodel import OrderDepth, TradingState, Order
 #hello
 
+
+class EwmaEngine:
+    # Exponentially weighted mean and variance of a series per symbol, for several spans at once (alpha = 2 / (span
+    # + 1)), updated in O(1) per value instead of going through the whole history again. The mean starts at the first
+    # value like the usual EMA recursion; the bias corrected mean starts from 0 and is divided by 1 - (1 - alpha)^n,
+    # so that it weighs the first values like the others
+    def __init__(self, subscriptions: Dict[str, List[int]] = None):
+        self.spans = {}  # symbol -> spans, in the order of the arrays below
+        self.alphas = {}
+        self.means = {}
+        self.variances = {}
+        self.raw_means = {}  # mean started from 0, for the bias correction
+        self.decays = {}  # (1 - alpha)^n, with n the number of values of the span
+        for symbol, spans in (subscriptions or {}).items():
+            self.subscribe(symbol, spans)
+
+    def subscribe(self, symbol: str, spans: List[int]):
+        # New spans of a symbol already updated start with the next value
+        spans = [span for span in spans if span not in self.spans.get(symbol, [])]
+        if not spans:
+            return
+        new_alphas = 2 / (np.asarray(spans, dtype=float) + 1)
+        self.spans[symbol] = self.spans.get(symbol, []) + list(spans)
+        self.alphas[symbol] = np.concatenate([self.alphas.get(symbol, []), new_alphas])
+        self.means[symbol] = np.concatenate([self.means.get(symbol, []), np.full(len(spans), np.nan)])
+        self.variances[symbol] = np.concatenate([self.variances.get(symbol, []), np.zeros(len(spans))])
+        self.raw_means[symbol] = np.concatenate([self.raw_means.get(symbol, []), np.zeros(len(spans))])
+        self.decays[symbol] = np.concatenate([self.decays.get(symbol, []), np.ones(len(spans))])
+
+    def update(self, symbol: str, value: float):
+        alphas = self.alphas[symbol]
+        means = self.means[symbol]
+        # Spans without a value yet start at this one
+        means[np.isnan(means)] = value
+        diff = value - means
+        increment = alphas * diff
+        self.variances[symbol] = (1 - alphas) * (self.variances[symbol] + diff * increment)
+        self.means[symbol] = means + increment
+        self.raw_means[symbol] = (1 - alphas) * self.raw_means[symbol] + alphas * value
+        self.decays[symbol] = self.decays[symbol] * (1 - alphas)
+
+    def mean(self, symbol: str, span: int, bias_corrected: bool = False):
+        i = self.spans[symbol].index(span)
+        if bias_corrected:
+            # A span subscribed late has no value of its own until the next update, whatever the symbol has seen
+            return self.raw_means[symbol][i] / (1 - self.decays[symbol][i]) if self.decays[symbol][i] < 1 else np.nan
+        return self.means[symbol][i]
+
+    def variance(self, symbol: str, span: int):
+        return self.variances[symbol][self.spans[symbol].index(span)]
+
+    def std(self, symbol: str, span: int):
+        return mt.sqrt(self.variance(symbol, span))
+
+
 class Trader:
     # Limits for each product
     limits = {"PEARLS": 20, "BANANAS": 20, "COCONUTS": 600, "PINA_COLADAS": 300}
+    # Fair value of COCONUTS and PINA_COLADAS: EMA of the mid price with alpha = 0.5
+    ewma = EwmaEngine({"COCONUTS": [3], "PINA_COLADAS": [3]})
 
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
         """"""
@@ -58,8 +115,8 @@ class Trader:
                 #             / (sum(order_depth.buy_orders.values()) - sum(order_depth.sell_orders.values()))
                 # fair_value_asset = vwap
                 # Compute the fair price based on the EMA
-                prices = list(order_depth.buy_orders.keys()) + list(order_depth.sell_orders.keys())
-                fair_value_asset = self.compute_ema(prices, alpha=0.5)
+                self.ewma.update(symbol, (best_bid + best_ask) / 2)
+                fair_value_asset = self.ewma.mean(symbol, 3)
 
 
                 # Computing the spread & fair prices
@@ -128,12 +185,6 @@ class Trader:
 
         return result
 
-    def compute_ema(prices, alpha):
-        ema = [prices[0]]
-        for price in prices[1:]:
-            ema.append(alpha * price + (1 - alpha) * ema[-1])
-        return ema[-1]
-        
     @staticmethod
     def get_current_pos_symbol(symbol, state):
         if symbol in state.position.keys():
@@ -6,6 +6,104 @@ import math as mt
 from datamodel import OrderDepth, TradingState, Order
 
 
+class TradeTape:
+    # Market trades indexed by (symbol, timestamp). The columns of each symbol live in a preallocated numpy array that
+    # doubles in size when full, together with the running sums of the quantity and of price * quantity, so the volume
+    # and VWAP over any window of timestamps are two binary searches and a difference, whatever the length of the tape.
+    # The exchange may send the same trades again on later ticks, and several batches may share a timestamp: a trade is
+    # identified by (timestamp, price, quantity, buyer, seller), and only the ones not on the tape yet are ingested
+    columns = ["timestamp", "price", "quantity", "cum_quantity", "cum_notional"]
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.data = {}  # symbol -> array of rows
+        self.sizes = {}  # symbol -> number of rows used
+        self.last_timestamps = {}  # symbol -> last timestamp ingested
+        self.last_keys = {}  # symbol -> {trade key: count} of the trades ingested at the last timestamp
+
+    def __len__(self):
+        return sum(self.sizes.values())
+
+    def count(self, symbol: str):
+        return self.sizes.get(symbol, 0)
+
+    def ingest(self, symbol: str, trades):
+        # Returns the number of trades added. Identical trades are counted: a key that appears n times in the batch
+        # adds the trades the tape is missing to have it n times. Trades older than the last timestamp are on the tape
+        # already, since the exchange sends the trades of a timestamp on the next ticks, so only the keys of the last
+        # timestamp are kept
+        last_timestamp = self.last_timestamps.get(symbol)
+        last_keys = self.last_keys.get(symbol, {})
+        incoming = {}  # trade key -> count in this batch
+        new_trades = []
+        for trade in sorted(trades, key=lambda trade: trade.timestamp):
+            if last_timestamp is not None and trade.timestamp < last_timestamp:
+                continue
+            key = (trade.timestamp, trade.price, trade.quantity, trade.buyer, trade.seller)
+            incoming[key] = incoming.get(key, 0) + 1
+            if incoming[key] > last_keys.get(key, 0):
+                new_trades.append(trade)
+        if not new_trades:
+            return 0
+        if symbol not in self.data:
+            self.data[symbol] = np.zeros((max(self.capacity, len(new_trades)), len(self.columns)))
+            self.sizes[symbol] = 0
+        data = self.data[symbol]
+        size = self.sizes[symbol]
+        if size + len(new_trades) > len(data):
+            grown = np.zeros((max(2 * len(data), size + len(new_trades)), len(self.columns)))
+            grown[:size] = data[:size]
+            data = self.data[symbol] = grown
+        cum_quantity = data[size - 1, 3] if size > 0 else 0.0
+        cum_notional = data[size - 1, 4] if size > 0 else 0.0
+        for trade in new_trades:
+            cum_quantity += trade.quantity
+            cum_notional += trade.price * trade.quantity
+            data[size] = (trade.timestamp, trade.price, trade.quantity, cum_quantity, cum_notional)
+            size += 1
+        self.sizes[symbol] = size
+        timestamp = new_trades[-1].timestamp
+        keys = dict(last_keys) if timestamp == last_timestamp else {}
+        for key, count in incoming.items():
+            if key[0] == timestamp:
+                keys[key] = max(count, keys.get(key, 0))
+        self.last_keys[symbol] = keys
+        self.last_timestamps[symbol] = timestamp
+        return len(new_trades)
+
+    def window(self, symbol: str, start: int, end: int):
+        # Rows [i, j) of the trades with start <= timestamp <= end
+        size = self.sizes.get(symbol, 0)
+        if size == 0:
+            return 0, 0
+        timestamps = self.data[symbol][:size, 0]
+        return int(np.searchsorted(timestamps, start, "left")), int(np.searchsorted(timestamps, end, "right"))
+
+    def window_sums(self, symbol: str, start: int, end: int):
+        # (traded quantity, traded notional) between start and end included
+        i, j = self.window(symbol, start, end)
+        if i >= j:
+            return 0.0, 0.0
+        data = self.data[symbol]
+        quantity = data[j - 1, 3] - (data[i - 1, 3] if i > 0 else 0.0)
+        notional = data[j - 1, 4] - (data[i - 1, 4] if i > 0 else 0.0)
+        return quantity, notional
+
+    def volume(self, symbol: str, start: int, end: int):
+        return self.window_sums(symbol, start, end)[0]
+
+    def vwap(self, symbol: str, start: int, end: int):
+        quantity, notional = self.window_sums(symbol, start, end)
+        if quantity == 0:
+            return np.nan
+        return notional / quantity
+
+    def to_frame(self, symbol: str):
+        # Copy of the tape of one symbol, for analysis only
+        return pd.DataFrame(self.data.get(symbol, np.zeros((0, len(self.columns))))[:self.count(symbol)],
+                            columns=self.columns)
+
+
 class Trader:
     # Creating a class attribute to store all the data we receive; populated iteratively
     df_data_market = pd.DataFrame()
@@ -13,6 +111,8 @@ class Trader:
     # df_data_trades = pd.DataFrame()
     # Logging performed trades
     df_data_trades = pd.DataFrame()
+    # Market trades of every symbol, see store_market_trades
+    market_tape = TradeTape()
     dolphin_sightings_history = []
     dolphin_change_history=[]
     Gear_price_history=[]
@@ -26,6 +126,10 @@ class Trader:
         # Initialize the method output dict as an empty dict
         result = {}
 
+        # Add the market trades of the previous timestamp to the tape
+        for symbol in state.market_trades.keys():
+            self.store_market_trades(symbol, state)
+
         # Looping through all the symbols
         for symbol in state.listings.keys():
             if symbol == "DIVING_GEAR":
@@ -242,45 +346,14 @@ class Trader:
             print(e)
 
     def store_market_trades(self, symbol: str, state: TradingState):
-        # Goal of this method is to store each trade we make. Since we have the data of the trades we make at the
-        # previous timestamps, there will always be a one-period lag
-        if symbol in state.market_trades.keys():
-            market_trades = state.market_trades[symbol]
-            # Now we loop through a list of Trade objects
-            if market_trades is not None:
-                qty_x_price_current_trades = sum([trade.price * trade.quantity for trade in market_trades])
-                total_qty_current_trades = sum([trade.quantity for trade in market_trades])
-                rows = []
-
-                trade_volume = 0
-                trade_qty = 0
-                for trade in market_trades:
-                    timestamp = trade.timestamp
-                    price = trade.price
-                    qty = trade.quantity
-                    avg_price = np.nan  # useful just for the first iteration
-
-                    # if (len(self.df_data_trades) > 0) and (timestamp == state.timestamp - 100):
-                    if timestamp == state.timestamp - 100:  # We only want to look once at each trade
-                        # if len(self.df_data_trades) == 0: # only if the dataframe is empty
-
-                        if len(self.df_data_trades) > 0:
-                            subset = self.df_data_trades[
-                                (self.df_data_trades['symbol'] == symbol) & (self.df_data_trades['qty'] != 0)]
-
-                            #moved seashells
-                            trade_volume += [price * qty]
-                            trade_qty += qty
-
-                if trade_volume == 0:
-                    avg_price = np.nan
-                else:
-                    # Calculate total cost
-                    avg_price = trade_volume/trade_qty
-                rows.append({'timestamp': timestamp, 'symbol': symbol, 'avg_price': avg_price, 'trade_qty': trade_qty})
-                # print("Traded " + str(symbol) + " price: ", str(price) + " volume: ", str(qty))
-                self.df_data_trades = pd.concat([self.df_data_trades, pd.DataFrame(rows)])
-                print(self.df_data_trades.tail())
+        # Goal of this method is to store the trades of the market. Since we get them at the next timestamp, there will
+        # always be a one-period lag; the tape skips the trades it already holds so each trade is stored once.
+        # Volumes and VWAPs over any window are then read with self.market_tape.volume/vwap
+        market_trades = state.market_trades.get(symbol)
+        if market_trades and self.market_tape.ingest(symbol, market_trades) > 0:
+            print("Market trades on " + symbol + " at " + str(state.timestamp - 100) + ": VWAP " +
+                  str(self.market_tape.vwap(symbol, state.timestamp - 100, state.timestamp - 100)) + ", volume " +
+                  str(self.market_tape.volume(symbol, state.timestamp - 100, state.timestamp - 100)))
 
 
 
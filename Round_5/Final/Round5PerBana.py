@@ -3,92 +3,721 @@ import pandas as pd
 import numpy as np
 import statistics as stat
 import math as mt
+import time
+from collections import OrderedDict, deque
 from datamodel import OrderDepth, TradingState, Order
 
 
+class MarketHistory:
+    # Columnar history of the order book snapshots of one symbol. Rows are written into a preallocated numpy array
+    # that doubles in size when full, so an append is amortized O(1) instead of the O(n) of a pd.concat.
+    # With a window, the array is used as a ring buffer: each row is written twice (at i and i + window) so the last
+    # `window` rows always form one contiguous slice and the column views we hand out are never copies
+    columns = ["timestamp", "bid_price_1", "bid_volume_1", "bid_price_2", "bid_volume_2", "bid_price_3",
+               "bid_volume_3", "ask_price_1", "ask_volume_1", "ask_price_2", "ask_volume_2", "ask_price_3",
+               "ask_volume_3", "mid_price", "spread"]
+    column_index = {name: i for i, name in enumerate(columns)}
+
+    def __init__(self, capacity: int = 1024, window: int = None):
+        self.window = window
+        if window is not None:
+            capacity = 2 * window
+        self.data = np.full((capacity, len(self.columns)), np.nan)
+        self.size = 0  # number of rows appended since the start, including the ones dropped by the ring
+        self.start = 0  # first row of the contiguous slice holding the history
+
+    def __len__(self):
+        if self.window is None:
+            return self.size
+        return min(self.size, self.window)
+
+    def append(self, values):
+        # values must follow the order of MarketHistory.columns
+        if self.window is None:
+            if self.size == len(self.data):
+                grown = np.full((2 * len(self.data), len(self.columns)), np.nan)
+                grown[:self.size] = self.data
+                self.data = grown
+            self.data[self.size] = values
+        else:
+            position = self.size % self.window
+            self.data[position] = values
+            self.data[position + self.window] = values
+            if self.size + 1 > self.window:
+                self.start = (self.size + 1) % self.window
+        self.size += 1
+
+    def rows(self):
+        # Zero-copy view of the stored rows, oldest first. Valid until the next append
+        return self.data[self.start:self.start + len(self)]
+
+    def column(self, name: str):
+        # Zero-copy view of one column, oldest first
+        return self.rows()[:, self.column_index[name]]
+
+    def tail(self, name: str, n: int):
+        # Zero-copy view of the last n values of one column
+        column = self.column(name)
+        return column[len(column) - n:]
+
+    def last(self, name: str):
+        if len(self) == 0:
+            return np.nan
+        return self.data[self.start + len(self) - 1, self.column_index[name]]
+
+    def to_frame(self):
+        # Copy of the history as a DataFrame, for analysis only; never call this in the hot path
+        return pd.DataFrame(self.rows(), columns=self.columns)
+
+
+class MarketStore:
+    # Market history partitioned by symbol at write time. Every tracked symbol gets exactly one row per tick (NaN
+    # prices when its book could not be read), so row i refers to the same timestamp for all the symbols and the
+    # strategies can combine their series directly, without masking or reindexing
+    def __init__(self, symbols, capacity: int = 1024, window: int = None):
+        self.symbols = list(symbols)
+        self.histories = {symbol: MarketHistory(capacity, window) for symbol in self.symbols}
+
+    def __len__(self):
+        return len(self.histories[self.symbols[0]])
+
+    def append(self, symbol: str, values):
+        self.histories[symbol].append(values)
+
+    def append_missing(self, symbol: str, timestamp: int):
+        # Keeps the symbols aligned when nothing could be stored for this tick
+        self.histories[symbol].append((timestamp,) + (np.nan,) * (len(MarketHistory.columns) - 1))
+
+    def history(self, symbol: str) -> MarketHistory:
+        return self.histories[symbol]
+
+    def series(self, symbol: str, name: str):
+        # Zero-copy view of one column of one symbol, aligned with the other symbols
+        return self.histories[symbol].column(name)
+
+    def timestamps(self):
+        return self.histories[self.symbols[0]].column("timestamp")
+
+    def index_of(self, timestamp: int):
+        # Row holding this timestamp, or None; timestamps are increasing so a binary search is enough
+        timestamps = self.timestamps()
+        i = int(np.searchsorted(timestamps, timestamp))
+        if i < len(timestamps) and timestamps[i] == timestamp:
+            return i
+        return None
+
+
+class BasketReplication:
+    # Synthetic replication of a basket by a weighted sum of its components, updated once per tick in O(1).
+    # Keeps the synthetic mid, the cost of buying the components at the best asks and the log spread between the
+    # basket and its replication, together with the mean/std of that spread (expanding, or over the last `window`
+    # ticks) so the strategies can read a z-score without going back over the history
+    def __init__(self, basket: str, weights: Dict[str, float], window: int = None):
+        self.basket = basket
+        self.weights = dict(weights)
+        self.window = window
+        self.spreads = np.zeros(window) if window is not None else None  # ring of the spreads in the window
+        self.position = 0  # next slot of the ring
+
+        self.timestamp = None
+        self.count = 0  # number of ticks that went into the statistics
+        self.mid_price = np.nan
+        self.min_buy_price = np.nan
+        self.spread = np.nan  # log(basket mid) - log(synthetic mid)
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, timestamp: int, mid_prices: Dict[str, float], ask_prices: Dict[str, float]):
+        # mid_prices must hold the basket and every component, ask_prices the components
+        if timestamp == self.timestamp:  # only one update per tick
+            return self.spread
+        self.timestamp = timestamp
+
+        self.mid_price = sum(weight * mid_prices[symbol] for symbol, weight in self.weights.items())
+        self.min_buy_price = sum(weight * ask_prices[symbol] for symbol, weight in self.weights.items())
+        self.spread = mt.log(mid_prices[self.basket]) - mt.log(self.mid_price)
+        if np.isnan(self.spread):  # one of the books was empty; the statistics are left untouched
+            return self.spread
+
+        if self.window is None or self.count < self.window:
+            # Welford's update
+            self.count += 1
+            delta = self.spread - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (self.spread - self.mean)
+        else:
+            # Replacing the oldest spread of the window by the new one
+            oldest = self.spreads[self.position]
+            previous_mean = self.mean
+            self.mean += (self.spread - oldest) / self.count
+            self.m2 += (self.spread - oldest) * (self.spread - self.mean + oldest - previous_mean)
+        if self.spreads is not None:
+            self.spreads[self.position] = self.spread
+            self.position = (self.position + 1) % self.window
+        return self.spread
+
+    def std(self):
+        if self.count < 2:
+            return np.nan
+        return mt.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    def z_score(self):
+        std = self.std()
+        if np.isnan(std) or std == 0:
+            return np.nan
+        return (self.spread - self.mean) / std
+
+
+class BasketSweepPlanner:
+    # Sizes the crossing of a basket and of its components together: `units` baskets means crossing weights[leg] *
+    # units on every leg, the components on the other side of the basket. The number of units is the largest that the
+    # strategy, the depth of every book and the position limits all allow, so the thinnest book bounds what is sent on
+    # the others and the fills stay hedged. On top of the units, a component can catch up with the hedge of the basket
+    # position (after a partial fill) with the rest of the volume the strategy wanted on it
+    def __init__(self, basket: str, weights: Dict[str, int]):
+        self.basket = basket
+        self.weights = {basket: 1, **weights}
+
+    @staticmethod
+    def take(levels, quantity: int):
+        # [(price, quantity)] crossing `quantity` on levels sorted best first, as far as they go
+        fills = []
+        for price, volume in levels:
+            if quantity <= 0:
+                break
+            taken = min(abs(volume), quantity)
+            fills.append((price, taken))
+            quantity -= taken
+        return fills
+
+    def plan(self, books, volumes: Dict[str, float], positions: Dict[str, int], limits: Dict[str, int]):
+        # books: symbol -> features of its book (see Trader.compute_book_features); volumes: symbol -> volume the
+        # strategy wants to cross on each leg (> 0 to buy). Returns the units crossed (> 0 when buying the basket), the
+        # orders of each leg and the slippage of each leg: what its fills cost over the same volume at the touch
+        direction = 0
+        for symbol in self.weights:
+            if volumes.get(symbol):
+                direction = int(np.sign(volumes[symbol])) * (1 if symbol == self.basket else -1)
+                break
+        plan = {"units": 0, "orders": {symbol: [] for symbol in self.weights},
+                "slippage": {symbol: 0.0 for symbol in self.weights}}
+        if direction == 0:
+            return plan
+
+        sides = {symbol: direction if symbol == self.basket else -direction for symbol in self.weights}
+        levels = {symbol: books[symbol]["asks"] if sides[symbol] > 0 else books[symbol]["bids"]
+                  for symbol in self.weights}
+        # Units wanted on every leg, units every book can take and units left before a position limit
+        units = min(int(max(0.0, sides[symbol] * volumes.get(symbol, 0)) // weight)
+                    for symbol, weight in self.weights.items())
+        depth = min(sum(abs(volume) for _, volume in levels[symbol]) // weight
+                    for symbol, weight in self.weights.items())
+        room = min(max(0, limits[symbol] - sides[symbol] * positions.get(symbol, 0)) // weight
+                   for symbol, weight in self.weights.items())
+        units = int(min(units, depth, room))
+        plan["units"] = direction * units
+
+        basket_hedge = positions.get(self.basket, 0) + direction * units
+        for symbol, weight in self.weights.items():
+            quantity = weight * units
+            if symbol != self.basket:
+                # Catching up with the hedge of the basket, within what the strategy wanted on the leg
+                gap = -weight * basket_hedge - positions.get(symbol, 0) - sides[symbol] * quantity
+                wanted = sides[symbol] * volumes.get(symbol, 0) - quantity
+                if gap * sides[symbol] > 0 and wanted > 0:
+                    quantity += int(min(abs(gap), wanted))
+            fills = self.take(levels[symbol], quantity)
+            plan["orders"][symbol] = [Order(symbol, price, sides[symbol] * filled) for price, filled in fills]
+            if fills:
+                touch = fills[0][0]
+                plan["slippage"][symbol] = float(sum(abs(price - touch) * filled for price, filled in fills))
+        return plan
+
+
+class HedgeRatioFilter:
+    # Kalman filter on y = beta * x + alpha + noise: the hedge ratio and the intercept are updated in O(1) per tick from
+    # the last mid prices, without regressing on the history. The filter starts from a least-squares fit on the first
+    # `warmup` ticks (running means and co-moments, no stored prices). Prices move little relative to their level, so
+    # a change of beta and a change of alpha look almost the same: only beta follows a random walk by default, the
+    # intercept keeps the value of the fit, refined as the ticks come but not drifting. The variance of the residuals
+    # is an exponentially weighted mean of the squared innovations
+    def __init__(self, beta_drift: float = 1e-8, alpha_drift: float = 0.0, noise_halflife: int = 500,
+                 warmup: int = 500):
+        self.drift = (beta_drift, alpha_drift)  # variance added to each coefficient per tick
+        self.noise_decay = 0.5 ** (1 / noise_halflife)
+        self.warmup = max(warmup, 3)
+
+        self.timestamp = None
+        self.count = 0
+        self.mean_x, self.mean_y = 0.0, 0.0
+        self.cxx, self.cxy, self.cyy = 0.0, 0.0, 0.0  # co-moments of the warmup ticks
+        self.beta = np.nan
+        self.alpha = 0.0
+        self.covariance = [[0.0, 0.0], [0.0, 0.0]]
+        self.noise_variance = np.nan  # of the residuals
+        self.residual = np.nan  # y - beta * x - alpha, before the update
+        self.innovation_variance = np.nan
+
+    def update(self, timestamp: int, x: float, y: float):
+        if timestamp == self.timestamp:  # only one update per tick
+            return self.residual
+        self.timestamp = timestamp
+        if np.isnan(x) or np.isnan(y):
+            return self.residual
+        self.count += 1
+        if self.count <= self.warmup:
+            self.add_to_fit(x, y)
+            if self.count == self.warmup:
+                self.start_from_fit()
+            return self.residual
+
+        # Prediction: the coefficients may have drifted since the last tick
+        (p00, p01), (p10, p11) = self.covariance
+        p00 += self.drift[0]
+        p11 += self.drift[1]
+
+        # Innovation, with h = (x, 1)
+        self.residual = y - self.beta * x - self.alpha
+        ph0 = p00 * x + p01
+        ph1 = p10 * x + p11
+        self.innovation_variance = x * ph0 + ph1 + self.noise_variance
+
+        # Correction
+        k0 = ph0 / self.innovation_variance
+        k1 = ph1 / self.innovation_variance
+        self.beta += k0 * self.residual
+        self.alpha += k1 * self.residual
+        self.covariance = [[p00 - k0 * ph0, p01 - k0 * ph1], [p10 - k1 * ph0, p11 - k1 * ph1]]
+        self.noise_variance = self.noise_decay * self.noise_variance + (1 - self.noise_decay) * self.residual ** 2
+        return self.residual
+
+    def add_to_fit(self, x: float, y: float):
+        # Welford's update of the means and co-moments, stable with prices far from 0
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.count
+        self.mean_y += dy / self.count
+        self.cxx += dx * (x - self.mean_x)
+        self.cxy += dx * (y - self.mean_y)
+        self.cyy += dy * (y - self.mean_y)
+
+    def start_from_fit(self):
+        # Least squares on the warmup ticks, with the covariance of the estimates as the prior of the filter. Flat
+        # prices give no slope: the ratio of the means then, with no intercept
+        n = self.count
+        if self.cxx > 0:
+            self.beta = self.cxy / self.cxx
+            self.alpha = self.mean_y - self.beta * self.mean_x
+            noise_variance = max((self.cyy - self.beta * self.cxy) / (n - 2), 1e-6)
+            self.covariance = [[noise_variance / self.cxx, -self.mean_x * noise_variance / self.cxx],
+                               [-self.mean_x * noise_variance / self.cxx,
+                                noise_variance * (1 / n + self.mean_x ** 2 / self.cxx)]]
+        else:
+            self.beta = self.mean_y / self.mean_x
+            self.alpha = 0.0
+            noise_variance = max(self.cyy / (n - 1), 1e-6)
+            self.covariance = [[1e-6, 0.0], [0.0, 0.0]]
+        self.noise_variance = noise_variance
+
+    def z_score(self):
+        if self.count <= self.warmup or not self.innovation_variance > 0:
+            return np.nan
+        return self.residual / mt.sqrt(self.innovation_variance)
+
+
+class RollingWindow:
+    # The last `capacity` values of a series in a fixed-size ring, with the sum, mean, min and max maintained in O(1)
+    # per append: the sum is updated with the value coming in and the one dropped, the extrema by monotonic deques of
+    # (index, value) whose front is the current min/max. Supports len() and indexing like the list it replaces
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.values = [0.0] * capacity
+        self.count = 0  # number of values appended since the start, including the ones dropped by the ring
+        self.total = 0.0
+        self.minima = deque()  # increasing values
+        self.maxima = deque()  # decreasing values
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __getitem__(self, i: int):
+        size = len(self)
+        if i < 0:
+            i += size
+        if i < 0 or i >= size:
+            raise IndexError("RollingWindow index out of range")
+        return self.values[(self.count - size + i) % self.capacity]
+
+    def append(self, value):
+        position = self.count % self.capacity
+        if self.count >= self.capacity:
+            self.total -= self.values[position]
+        self.values[position] = value
+        self.total += value
+        self.count += 1
+        if self.count % (64 * self.capacity) == 0:  # clears the rounding errors piled up by the running sum
+            self.total = sum(self.values)
+
+        oldest = self.count - self.capacity  # index of the oldest value still in the window
+        while self.minima and self.minima[-1][1] > value:
+            self.minima.pop()
+        self.minima.append((self.count - 1, value))
+        if self.minima[0][0] < oldest:
+            self.minima.popleft()
+        while self.maxima and self.maxima[-1][1] < value:
+            self.maxima.pop()
+        self.maxima.append((self.count - 1, value))
+        if self.maxima[0][0] < oldest:
+            self.maxima.popleft()
+
+    def last(self):
+        return self[-1]
+
+    def sum(self):
+        return self.total
+
+    def mean(self):
+        if self.count == 0:
+            return np.nan
+        return self.total / len(self)
+
+    def min(self):
+        if self.count == 0:
+            return np.nan
+        return self.minima[0][1]
+
+    def max(self):
+        if self.count == 0:
+            return np.nan
+        return self.maxima[0][1]
+
+
+class TradeLedger:
+    # Our fills of one symbol, appended to a preallocated numpy array that doubles in size when full. The position,
+    # average entry price and realized PnL are running aggregates (average cost accounting), so a fill is booked in
+    # O(1) however many came before it. Each row also records the aggregates right after its fill
+    columns = ["timestamp", "price", "qty", "position", "avg_price", "realized_pnl"]
+
+    def __init__(self, symbol: str, capacity: int = 256):
+        self.symbol = symbol
+        self.data = np.full((capacity, len(self.columns)), np.nan)
+        self.size = 0
+        self.position = 0
+        self.avg_price = np.nan  # average entry price of the open position, NaN when flat
+        self.realized_pnl = 0.0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, timestamp: int, price: float, qty: int):
+        # qty is signed: positive when we bought
+        if qty == 0:
+            return
+        if self.position == 0 or (self.position > 0) == (qty > 0):
+            # Opening or adding to the position: the entry price becomes the weighted average
+            cost = 0.0 if self.position == 0 else self.avg_price * self.position
+            self.position += qty
+            self.avg_price = (cost + price * qty) / self.position
+        else:
+            # Reducing the position: the closed part realizes its PnL against the entry price, and if we went
+            # through zero the rest opens a new position at the price of the fill
+            closed = min(abs(qty), abs(self.position))
+            direction = 1 if self.position > 0 else -1
+            self.realized_pnl += (price - self.avg_price) * closed * direction
+            self.position += qty
+            if self.position == 0:
+                self.avg_price = np.nan
+            elif (self.position > 0) != (direction > 0):
+                self.avg_price = price
+
+        if self.size == len(self.data):
+            grown = np.full((2 * len(self.data), len(self.columns)), np.nan)
+            grown[:self.size] = self.data
+            self.data = grown
+        self.data[self.size] = (timestamp, price, qty, self.position, self.avg_price, self.realized_pnl)
+        self.size += 1
+
+    def unrealized_pnl(self, mark_price: float):
+        if self.position == 0:
+            return 0.0
+        return (mark_price - self.avg_price) * self.position
+
+    def to_frame(self):
+        # Read-only DataFrame over the booked fills, for analysis only; never call this in the hot path
+        rows = self.data[:self.size]
+        rows.flags.writeable = False
+        return pd.DataFrame(rows, columns=self.columns, copy=False)
+
+
+class OrderMemo:
+    # Orders already computed by a strategy, keyed by a fingerprint of everything they depend on (the books and the
+    # state the strategy reads). When the same inputs come back, e.g. the PEARLS book that often does not move between
+    # ticks, the orders are rebuilt from the memo instead of going through the strategy and the trimming again.
+    # Bounded: the least recently used entry is evicted first. Hits and misses are counted per strategy
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # (name, fingerprint) -> {symbol: ((price, quantity), ...)}
+        self.hits = {}
+        self.misses = {}
+
+    @staticmethod
+    def fingerprint(order_depths, *strategy_state):
+        # Must be taken before the strategy runs, since some strategies remove levels from the books
+        books = tuple((tuple(depth.buy_orders.items()), tuple(depth.sell_orders.items())) for depth in order_depths)
+        return books + strategy_state
+
+    def get(self, name: str, fingerprint):
+        # Fresh Orders (the trimming modifies them in place) per symbol, or None when the inputs were never seen
+        entry = self.entries.get((name, fingerprint))
+        if entry is None:
+            self.misses[name] = self.misses.get(name, 0) + 1
+            return None
+        self.entries.move_to_end((name, fingerprint))
+        self.hits[name] = self.hits.get(name, 0) + 1
+        return {symbol: [Order(symbol, price, quantity) for price, quantity in orders]
+                for symbol, orders in entry.items()}
+
+    def put(self, name: str, fingerprint, orders: Dict[str, List[Order]]):
+        self.entries[(name, fingerprint)] = {symbol: tuple((order.price, order.quantity) for order in symbol_orders)
+                                             for symbol, symbol_orders in orders.items()}
+        self.entries.move_to_end((name, fingerprint))
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self, name: str):
+        total = self.hits.get(name, 0) + self.misses.get(name, 0)
+        if total == 0:
+            return np.nan
+        return self.hits.get(name, 0) / total
+
+
+class Diagnostics:
+    # Leveled logs with per-subsystem toggles. The call sites pass the pieces of a message rather than a formatted
+    # string: they are only converted and joined when the level and the subsystem are enabled, so a disabled message
+    # costs one comparison. Pieces that take work to compute (rounding, a z-score, a frame) are still evaluated by the
+    # call, so those call sites check enabled() first. Everything is off by default since printing was most of the
+    # time spent in run
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    OFF = 100
+
+    def __init__(self, level: int = OFF, subsystems=None, stream=None):
+        self.level = level
+        self.subsystems = None if subsystems is None else set(subsystems)  # None enables all of them
+        self.stream = stream  # None prints to stdout, which the exchange captures
+
+    def enabled(self, subsystem: str, level: int):
+        return level >= self.level and (self.subsystems is None or subsystem in self.subsystems)
+
+    def log(self, subsystem: str, level: int, *parts):
+        if level >= self.level and (self.subsystems is None or subsystem in self.subsystems):
+            print("".join([str(part) for part in parts]), file=self.stream)
+
+    def debug(self, subsystem: str, *parts):
+        if self.level <= self.DEBUG:
+            self.log(subsystem, self.DEBUG, *parts)
+
+    def info(self, subsystem: str, *parts):
+        if self.level <= self.INFO:
+            self.log(subsystem, self.INFO, *parts)
+
+    def warning(self, subsystem: str, *parts):
+        if self.level <= self.WARNING:
+            self.log(subsystem, self.WARNING, *parts)
+
+
 class Trader:
     # Limits for each product
-    df_data_market = pd.DataFrame()
-    df_data_trades = pd.DataFrame()
-    ratio_history=[]
-    dolphin_sightings_history = []
-    dolphin_change_history=[]
-    Gear_price_history=[]
-    jump_timestamps = []
+    market_store = MarketStore(["BAGUETTE", "UKULELE", "DIP", "PICNIC_BASKET"])
+    book_features = {}  # symbol -> (timestamp, features of the book at that timestamp)
+    order_memo = OrderMemo()  # orders of the strategies that only depend on their books and positions
+    handler_seconds = {}  # strategy -> total time spent in it
+    handler_calls = {}  # strategy -> number of times it ran (memo hits excluded)
+    handler_recent_seconds = {}  # strategy -> RollingWindow of the time of its last runs, to predict the next one
+    handler_skips = {}  # strategy -> number of ticks it was skipped for lack of time
+    basket_replication = BasketReplication("PICNIC_BASKET", {"BAGUETTE": 2, "UKULELE": 1, "DIP": 4})
+    basket_planner = BasketSweepPlanner("PICNIC_BASKET", {"BAGUETTE": 2, "UKULELE": 1, "DIP": 4})
+    trade_ledgers = {}  # symbol -> TradeLedger of our fills
+    coco_pina_hedge = HedgeRatioFilter()  # PINA_COLADAS = beta * COCONUTS + alpha
+    ratio_history = RollingWindow(5)
+    dolphin_sightings_history = RollingWindow(3)
+    dolphin_change_history = RollingWindow(100)
+    Gear_price_history = RollingWindow(25)  # resized to params["gear_average_window"] on the first diving gear tick
+    jump_timestamps = RollingWindow(1)
     picnic_pt = []
     picnic_trend = {"down": False, "up": False}
+    # Subsystems: handlers, scheduler, orders, limits, trades, pearls_bananas, coco_pina, diving_gear, berries, basket
+    diagnostics = Diagnostics()
     
     limits = {"PEARLS": 20, "BANANAS": 20, "COCONUTS": 600, "PINA_COLADAS": 300, "BERRIES": 250, "DIVING_GEAR": 50,
               "BAGUETTE": 150, "DIP": 300, "UKULELE": 70, "PICNIC_BASKET": 70}
 
+    # The strategy of each product. A strategy runs when the book of its first product is quoted on both sides and
+    # returns the orders of all its products. "inputs" are the books it reads: a strategy that keeps a history or
+    # depends on the time runs on every tick, the others only when their books or positions changed (otherwise the
+    # orders come from the memo). Products without a strategy, like DOLPHIN_SIGHTINGS, get no entry in the result.
+    # "must_run" strategies are the cheap market making: they run first and always; the others only run while the
+    # tick budget (params["tick_budget"]) allows it, and send no orders on the ticks they are skipped: orders of a
+    # previous tick were sized against its positions and books, and sending them again can overshoot the target
+    handlers = [{"name": "PEARLS", "products": ["PEARLS"], "inputs": ["PEARLS"], "every_tick": False,
+                 "must_run": True, "method": "handle_pearl_banana"},
+                {"name": "BANANAS", "products": ["BANANAS"], "inputs": ["BANANAS"], "every_tick": False,
+                 "must_run": True, "method": "handle_pearl_banana"},
+                {"name": "COCONUTS", "products": ["COCONUTS"], "inputs": ["COCONUTS", "PINA_COLADAS"],
+                 "every_tick": True, "must_run": False, "method": "handle_coco_pina"},
+                {"name": "PINA_COLADAS", "products": ["PINA_COLADAS"], "inputs": ["COCONUTS", "PINA_COLADAS"],
+                 "every_tick": True, "must_run": False, "method": "handle_coco_pina"},
+                {"name": "DIVING_GEAR", "products": ["DIVING_GEAR"], "inputs": ["DIVING_GEAR", "DOLPHIN_SIGHTINGS"],
+                 "every_tick": True, "must_run": False, "method": "handle_diving_gear"},
+                {"name": "BERRIES", "products": ["BERRIES"], "inputs": ["BERRIES"], "every_tick": True,
+                 "must_run": False, "method": "handle_berries"},
+                {"name": "BASKET", "products": ["DIP", "PICNIC_BASKET", "UKULELE", "BAGUETTE"],
+                 "inputs": ["DIP", "PICNIC_BASKET", "UKULELE", "BAGUETTE"], "every_tick": True,
+                 "must_run": False, "method": "handle_basket"}]
+    handler_by_trigger = {handler["products"][0]: handler for handler in handlers}
+
+    # Tunable constants of the strategies; Backtest/sweep.py overrides them by name
+    params = {"berries_max_volume_per_order": 1,  # max sizing we want to fill for a price
+              "berries_timestamp_delta": 1000,  # dt between two orders when building/unloading the long position
+              "berries_short_timestamp_delta": 200,  # dt between two orders when building the short position
+              "basket_short_band": 0.0075,  # log spread above which we short the basket
+              "basket_short_full_band": 0.01,  # log spread at which the short position reaches the limit
+              "basket_long_band": 0.0025,  # log spread below which we long the basket
+              "gear_jump_threshold": 10,  # change in dolphin sightings that we consider a jump
+              "gear_jump_cooldown": 10000,  # time after a jump before we can exit the diving gear position
+              "gear_average_window": 25,  # number of diving gear prices in the moving average
+              "coco_pina_signal": "ratio",  # "ratio": fixed bands on PC / COCO, "kalman": z-score of the hedge filter
+              "coco_pina_entry_z": 2.0,  # z-score beyond which we open the pair ("kalman" signal)
+              "coco_pina_exit_z": 0.5,  # z-score under which we unwind it ("kalman" signal)
+              # Seconds run may take before the strategies that are not must_run get skipped. Backtest/benchmark.py
+              # measures the ticks: on round 5 day 0 the slowest one takes about 10ms with the diagnostics off and
+              # 120ms with all of them at DEBUG, so this only trips on a stalled tick
+              "tick_budget": 0.5}
+
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
         """"""
+        deadline = time.perf_counter() + self.params["tick_budget"]
         result = {}
 
-        # Looping through all the symbols
-        for symbol in state.listings.keys():  # done once and for all the symbols; useful to have same pasta across !=
-            # timestamps
-            # Add the data for this symbol
-            if symbol == "BAGUETTE" or symbol == "UKULELE" or symbol == "DIP" or symbol == "PICNIC_BASKET":
-                self.store_data_market(symbol, state)
+        # Storing the data of the symbols we keep a history for; done once and for all the symbols so that every
+        # series stays aligned across timestamps
+        for symbol in self.market_store.symbols:
+            self.store_data_market(symbol, state)
 
         for symbol in state.listings.keys():
-            # if symbol == "BERRIES":  
-            #     # timestamps
-            #     # Add the data for this symbol
-            #     self.store_data_market(symbol, state)
-            if symbol == "DOLPHIN_SIGHTINGS":
-                continue
-            # Initialize the list of Orders to be sent as an empty list
-            orders: list[Order] = []
-            # Retrieve the Order Depth containing all the market BUY and SELL orders for the symbol
+            if symbol in self.limits:
+                self.store_data_position(symbol, state)
+
+        # The strategies that must run go first, the others follow in the order of the listings, since some of them
+        # trim the books they read (the market making only trims its own book)
+        triggers = [symbol for symbol in state.listings.keys() if symbol in self.handler_by_trigger]
+        triggers.sort(key=lambda trigger: not self.handler_by_trigger[trigger]["must_run"])
+        for symbol in triggers:
+            handler = self.handler_by_trigger[symbol]
             order_depth: OrderDepth = state.order_depths[symbol]
-            position_limit = self.limits.get(symbol)
-            
-            if symbol in state.position.keys():
-                current_pos = state.position[symbol]
-            else:
-                current_pos = 0
-                # First we see if both sides of the market are quoted
+            # First we see if both sides of the market are quoted
             if (len(order_depth.sell_orders) > 0) and (len(order_depth.buy_orders) > 0):
-                if symbol == "PEARLS" or symbol == "BANANAS":
-                    orders = self.get_orders_pearl_banana(symbol, state, current_pos, position_limit)
-                    orders = self.trim_orders(symbol, state, orders)
-                if symbol == "COCONUTS" or symbol == "PINA_COLADAS": 
-                    orders = self.get_orders_coco_pina(symbol, state, current_pos, position_limit)
-                 
-                if symbol == "DIVING_GEAR": 
-                    orders = self.get_orders_diving_gear(symbol, state, current_pos, position_limit)
-                    # orders = self.trim_orders(symbol, state, orders)
-                if symbol == "BERRIES":  
-                    orders = self.get_orders_berries(state)
-                if symbol == "DIP":  # can only look at dip since we'll trade them as a pair
-                    orders_basket = self.get_orders_basket(state)
-                    result["DIP"] = orders_basket.get("DIP")
-                    result["PICNIC_BASKET"] = orders_basket.get("PICNIC_BASKET")
-                    result["UKULELE"] = orders_basket.get("UKULELE")
-                    result["BAGUETTE"] = orders_basket.get("BAGUETTE")
-            
-            # Add all the above orders to the result dict
-            result[symbol] = orders
+                if handler["must_run"] or self.fits_in_budget(handler, deadline):
+                    result.update(self.run_handler(handler, state))
+                else:
+                    self.skip_handler(handler, deadline)
         return result
 
+    def fits_in_budget(self, handler, deadline):
+        # Whether the strategy should be done before the deadline, judging by its slowest recent run
+        recent = self.handler_recent_seconds.get(handler["name"])
+        expected = recent.max() if recent is not None and len(recent) > 0 else 0.0
+        return time.perf_counter() + expected < deadline
+
+    def skip_handler(self, handler, deadline):
+        # No time left for the strategy: it sends no orders this tick and runs again on the next one
+        name = handler["name"]
+        self.handler_skips[name] = self.handler_skips.get(name, 0) + 1
+        if self.diagnostics.enabled("scheduler", Diagnostics.WARNING):
+            self.diagnostics.warning("scheduler", name, " skipped, ",
+                                     round((deadline - time.perf_counter()) * 1e3, 1), "ms left in the tick")
+
+    def run_handler(self, handler, state: TradingState):
+        name = handler["name"]
+        fingerprint = None
+        if not handler["every_tick"]:
+            # Same books and positions as a previous tick: same orders
+            fingerprint = self.order_memo.fingerprint(
+                [state.order_depths[symbol] for symbol in handler["inputs"]],
+                tuple(self.get_pos_symbol(symbol, state) for symbol in handler["products"]))
+            orders = self.order_memo.get(name, fingerprint)
+            if orders is not None:
+                self.diagnostics.debug("handlers", "Orders of ", name, " reused from the memo")
+                return orders
+
+        start = time.perf_counter()
+        orders = getattr(self, handler["method"])(handler["products"][0], state)
+        elapsed = time.perf_counter() - start
+        self.handler_seconds[name] = self.handler_seconds.get(name, 0.0) + elapsed
+        self.handler_calls[name] = self.handler_calls.get(name, 0) + 1
+        if name not in self.handler_recent_seconds:
+            self.handler_recent_seconds[name] = RollingWindow(50)
+        self.handler_recent_seconds[name].append(elapsed)
+        if self.diagnostics.enabled("handlers", Diagnostics.DEBUG):
+            self.diagnostics.debug("handlers", name, " ran in ", round(elapsed * 1e6), "us")
+
+        if fingerprint is not None:
+            self.order_memo.put(name, fingerprint, orders)
+        return orders
+
+    def handler_report(self):
+        # Per strategy: number of runs, mean time of a run in microseconds, share of the ticks served by the memo and
+        # number of ticks skipped for lack of time
+        report = {}
+        for handler in self.handlers:
+            name = handler["name"]
+            calls = self.handler_calls.get(name, 0)
+            mean = self.handler_seconds.get(name, 0.0) / calls * 1e6 if calls else np.nan
+            report[name] = {"calls": calls, "mean_us": mean, "memo_hit_rate": self.order_memo.hit_rate(name),
+                            "skipped": self.handler_skips.get(name, 0)}
+        return report
+
+    def handle_pearl_banana(self, symbol, state):
+        current_pos = self.get_pos_symbol(symbol, state)
+        orders, fair_value = self.get_orders_pearl_banana(symbol, state, current_pos, self.limits[symbol])
+        return {symbol: self.trim_orders(symbol, state, orders, fair_value)}
+
+    def handle_coco_pina(self, symbol, state):
+        current_pos = self.get_pos_symbol(symbol, state)
+        orders, fair_value = self.get_orders_coco_pina(symbol, state, current_pos, self.limits[symbol])
+        return {symbol: self.trim_orders(symbol, state, orders, fair_value)}
+
+    def handle_diving_gear(self, symbol, state):
+        current_pos = self.get_pos_symbol(symbol, state)
+        orders = self.get_orders_diving_gear(symbol, state, current_pos, self.limits[symbol])
+        return {symbol: self.trim_orders(symbol, state, orders)}
+
+    def handle_berries(self, symbol, state):
+        return {symbol: self.trim_orders(symbol, state, self.get_orders_berries(state))}
+
+    def handle_basket(self, symbol, state):
+        orders_basket = self.get_orders_basket(state)
+        return {basket_symbol: self.trim_orders(basket_symbol, state, orders_basket.get(basket_symbol) or [])
+                for basket_symbol in ["DIP", "PICNIC_BASKET", "UKULELE", "BAGUETTE"]}
+
 
     def print_orders(self, orders: list[Order]):
-        print("-------------- orders we put ------------------------")
+        if not self.diagnostics.enabled("orders", Diagnostics.DEBUG):
+            return
+        self.diagnostics.debug("orders", "-------------- orders we put ------------------------")
         for order in orders:
-            if order.quantity < 0:
-                print("SELL order for ", order.symbol, " p: ", order.price, " q: ", order.quantity)
-            else:
-                print("BUY order for ", order.symbol, " p: ", order.price, " q: ", order.quantity)
-        print("-------------- orders we put ------------------------")
+            side = "SELL" if order.quantity < 0 else "BUY"
+            self.diagnostics.debug("orders", side, " order for ", order.symbol, " p: ", order.price, " q: ",
+                                   order.quantity)
+        self.diagnostics.debug("orders", "-------------- orders we put ------------------------")
 
 
-    def trim_orders(self, symbol, state, orders):
-        if symbol in state.position.keys():
-            position = state.position[symbol]
-        else:
-            position = 0
+    def trim_orders(self, symbol, state, orders, fair_value=None):
+        # Makes sure the aggregated buy/sell volumes can't break the position limit of the symbol: the exchange would
+        # cancel all our orders otherwise. Without fair value, the biggest orders are trimmed first; with one, the
+        # orders priced the furthest away from it (the least likely to go through) are trimmed first
+        position = self.get_pos_symbol(symbol, state)
         # break orders into two sublists, because the aggregated sell/buy volumes matter
         buys = [order for order in orders if order.quantity > 0]
         sells = [order for order in orders if order.quantity < 0]
@@ -97,25 +726,20 @@ class Trader:
             sum_buy = sum([b.quantity for b in buys])
             buy_surplus = position + sum_buy - self.limits[symbol]
             if buy_surplus > 0:
-                print("We have Surplus on", symbol, "Position is", position, "we want to buy", sum_buy)
-                # trim buy orders
-                # targetting the least probable to go through orders first
-                # we sort them and reduce the volumes until we don't have the problem anymore
-                buys.sort(key=lambda x: x.quantity, reverse=True)
-                # buys are sorted based on their price. the lowest price in the list is less likely to be picked up
-                for i in range(buy_surplus):
-                    # each iteration we:
-                    # -reduce the least probable order volume by 1
-                    # -if its volume hits 0, we remove it from our buys
-                    buys[0].quantity = buys[0].quantity - 1
-                    if buys[0].quantity == 0:
-                        buys.pop(0)
+                self.diagnostics.warning("limits", "We have Surplus on ", symbol, " Position is ", position,
+                                         " we want to buy ", sum_buy)
+                if fair_value is None:
+                    buys.sort(key=lambda x: x.quantity, reverse=True)
+                else:
+                    buys.sort(key=lambda x: abs(x.price - fair_value), reverse=True)
+                buys = self.clip_orders_volume(buys, buy_surplus)
 
             # but how about fitting the order? :)
             if symbol == "PEARLS" or symbol == "BANANAS":
         
                 if buy_surplus < 0:
-                    print("We have room to grow on buy side", symbol, "Position is", position, "we want to buy", sum_buy)
+                    self.diagnostics.debug("limits", "We have room to grow on buy side ", symbol, " Position is ",
+                                           position, " we want to buy ", sum_buy)
                     # fit buy orders to limits
                     # increment every buy order volume 1 by 1 until we reach limit
                     # we don't necessarily have to sort them now, we can experiment with it later
@@ -130,24 +754,19 @@ class Trader:
             sum_sell = sum([b.quantity for b in sells])
             sell_surplus = -self.limits[symbol] - (position + sum_sell)
             if sell_surplus > 0:
-                print("We have Surplus on", symbol, "Position is", position, "we want to buy", sum_sell)
-                # trim sell orders
-                # targettin the least probable to go through order first
-                # we sort them and reduce the volumes until we don't have the problem anymore
-                sells.sort(key=lambda x: x.quantity)
-                # sells are sorted based on their price, descending. the highest price is least attractive for bots
-                for i in range(sell_surplus):
-                    # each iteration we:
-                    # -increase the least attractive order volume by 1 (sells are negative)
-                    # -if its volume hits 0, we remove it from our sells
-                    sells[0].quantity = sells[0].quantity + 1
-                    if sells[0].quantity == 0:
-                        sells.pop(0)
+                self.diagnostics.warning("limits", "We have Surplus on ", symbol, " Position is ", position,
+                                         " we want to buy ", sum_sell)
+                if fair_value is None:
+                    sells.sort(key=lambda x: x.quantity)
+                else:
+                    sells.sort(key=lambda x: abs(x.price - fair_value), reverse=True)
+                sells = self.clip_orders_volume(sells, sell_surplus)
 
             # how about fitting the order? :)
             if symbol == "PEARLS" or symbol == "BANANAS":
                 if sell_surplus < 0:
-                    print("We have room to grow on sell side", symbol, "Position is", position, "we want to sell", sum_sell)
+                    self.diagnostics.debug("limits", "We have room to grow on sell side ", symbol, " Position is ",
+                                           position, " we want to sell ", sum_sell)
                     #sells.sort(key=lambda x: x.price)
                     for sell in sells:
                         if sell_surplus < 0:
@@ -160,11 +779,24 @@ class Trader:
         self.print_orders(result)
         return result
 
+    @staticmethod
+    def clip_orders_volume(orders, surplus):
+        # Removes `surplus` units from orders that are all on the same side, in the given order of priority: each order
+        # is cut by as much as still needed in one step, and orders left with no volume are dropped
+        kept = []
+        for order in orders:
+            if surplus > 0:
+                cut = min(surplus, abs(order.quantity))
+                surplus -= cut
+                order.quantity = order.quantity - cut if order.quantity > 0 else order.quantity + cut
+            if order.quantity != 0:
+                kept.append(order)
+        return kept
+
     def store_data_market(self, symbol, state: TradingState):
         # Appends data related to a symbol to the dataframe that stores all the info
         try:
             timestamp = state.timestamp
-            order_depth = state.order_depths[symbol]
             ask_1 = np.nan
             volume_ask_1 = np.nan
             ask_2 = np.nan
@@ -182,165 +814,157 @@ class Trader:
             mid_price = np.nan
             spread = np.nan
 
-            # Sell side
-            if len(order_depth.sell_orders) == 1:
-                ask_1 = min(order_depth.sell_orders.keys())
-                volume_ask_1 = order_depth.sell_orders[ask_1]
-
-            if len(order_depth.sell_orders) == 2:
-                ask_1 = min(order_depth.sell_orders.keys())
-                volume_ask_1 = order_depth.sell_orders[ask_1]
-                ask_2 = list(order_depth.sell_orders.keys())[1]
-                volume_ask_2 = order_depth.sell_orders[ask_2]
-
-            if len(order_depth.sell_orders) == 3:
-                ask_1 = min(order_depth.sell_orders.keys())
-                volume_ask_1 = order_depth.sell_orders[ask_1]
-                ask_2 = list(order_depth.sell_orders.keys())[1]
-                volume_ask_2 = order_depth.sell_orders[ask_2]
-                ask_3 = max(order_depth.sell_orders.keys())
-                volume_ask_3 = order_depth.sell_orders[ask_3]
-
-            # Buy side
-            if len(order_depth.buy_orders) == 1:
-                bid_1 = max(order_depth.buy_orders.keys())
-                volume_bid_1 = order_depth.buy_orders[bid_1]
-
-            if len(order_depth.buy_orders) == 2:
-                bid_1 = max(order_depth.buy_orders.keys())
-                volume_bid_1 = order_depth.buy_orders[bid_1]
-                bid_2 = list(order_depth.buy_orders.keys())[1]
-                volume_bid_2 = order_depth.buy_orders[bid_2]
-
-            if len(order_depth.buy_orders) == 3:
-                bid_1 = max(order_depth.buy_orders.keys())
-                volume_bid_1 = order_depth.buy_orders[bid_1]
-                bid_2 = list(order_depth.buy_orders.keys())[1]
-                volume_bid_2 = order_depth.buy_orders[bid_2]
-                bid_3 = min(order_depth.buy_orders.keys())
-                volume_bid_3 = order_depth.buy_orders[bid_3]
-
-            if (len(order_depth.buy_orders) > 0) and (len(order_depth.sell_orders) > 0):
-                mid_price = (bid_1 + ask_1) / 2  # if we're here we know bid_1 & ask_1 are defined
-                spread = ask_1 - bid_1
-
-            # Add new row to df class attribute
-            row = [{'timestamp': timestamp, 'symbol': symbol, 'bid_price_1': bid_1, 'bid_volume_1': volume_bid_1,
-                    'bid_price_2': bid_2,
-                    'bid_volume_2': volume_bid_2, 'bid_price_3': bid_3, 'bid_volume_3': volume_bid_3,
-                    'ask_price_1': ask_1,
-                    'ask_volume_1': volume_ask_1, 'ask_price_2': ask_2, 'ask_volume_2': volume_ask_2,
-                    'ask_price_3': ask_3,
-                    'ask_volume_3': volume_ask_3, 'mid_price': mid_price, "spread": spread}]
-            self.df_data_market = pd.concat([self.df_data_market, pd.DataFrame(row)])
-            # print(self.df.tail())
-
-        except Exception:  # Could happen if nothing in the order book for one side/both sides
-            pass
+            # Up to 3 levels per side, best first
+            book = self.get_book_features(symbol, state)
+            asks = book["asks"]
+            bids = book["bids"]
+            if len(asks) > 0:
+                ask_1, volume_ask_1 = asks[0]
+            if len(asks) > 1:
+                ask_2, volume_ask_2 = asks[1]
+            if len(asks) > 2:
+                ask_3, volume_ask_3 = asks[2]
+            if len(bids) > 0:
+                bid_1, volume_bid_1 = bids[0]
+            if len(bids) > 1:
+                bid_2, volume_bid_2 = bids[1]
+            if len(bids) > 2:
+                bid_3, volume_bid_3 = bids[2]
+
+            if bids and asks:
+                mid_price = book["mid_price"]
+                spread = book["spread_market"]
+
+            # Add new row to the history of the symbol, same order as MarketHistory.columns
+            self.market_store.append(symbol, (timestamp, bid_1, volume_bid_1, bid_2, volume_bid_2, bid_3,
+                                              volume_bid_3, ask_1, volume_ask_1, ask_2, volume_ask_2, ask_3,
+                                              volume_ask_3, mid_price, spread))
+
+        except Exception:  # Could happen if the symbol is not in the order depths at this timestamp
+            self.market_store.append_missing(symbol, state.timestamp)
 
 
     def store_data_position(self, symbol: str, state: TradingState):
-        if symbol in state.own_trades.keys():
-            own_trades = state.own_trades[symbol]
-            # Now we loop through a list of Trade objects
-            if own_trades is not None:
-                qty_x_price_current_trades = sum([trade.price * trade.quantity for trade in own_trades])
-                total_qty_current_trades = sum([trade.quantity for trade in own_trades])
-                rows = []
-
-                for trade in own_trades:
-                    timestamp = trade.timestamp
-                    price = trade.price
-                    qty = trade.quantity
-                    avg_price = np.nan  # useful just for the first iteration
-
-                    # if (len(self.df_data_trades) > 0) and (timestamp == state.timestamp - 100):
-                    if timestamp == state.timestamp - 100:  # We only want to look once at each trade
-                        # if len(self.df_data_trades) == 0: # only if the dataframe is empty
-                        if len(self.df_data_trades) > 0:
-                            subset = self.df_data_trades[
-                                (self.df_data_trades['symbol'] == symbol) & (self.df_data_trades['qty'] != 0)]
-
-                            # Calculate net position
-                            net_position = subset['qty'].sum() + total_qty_current_trades
-
-                            if net_position == 0:
-                                avg_price = np.nan
-                            else:
-                                # Calculate total cost
-                                total_cost = (subset['price'] * subset['qty']).sum() + qty_x_price_current_trades
-                                # Calculate weighted average price
-                                avg_price = total_cost / net_position
-                        rows.append({'timestamp': timestamp, 'symbol': symbol, 'price': price, 'qty': qty, 'avg_price':
-                            avg_price})
-                        print("Traded " + str(symbol) + " price: ", str(price) + " volume: ", str(qty))
-                self.df_data_trades = pd.concat([self.df_data_trades, pd.DataFrame(rows)])
-                print(self.df_data_trades.tail())
+        # Books our fills of the previous tick into the ledger of the symbol
+        own_trades = state.own_trades.get(symbol)
+        if not own_trades:
+            return
+        ledger = self.trade_ledgers.get(symbol)
+        if ledger is None:
+            ledger = self.trade_ledgers[symbol] = TradeLedger(symbol)
+        for trade in own_trades:
+            if trade.timestamp == state.timestamp - 100:  # We only want to look once at each trade
+                qty = trade.quantity
+                if trade.buyer == "SUBMISSION":
+                    qty = abs(qty)
+                elif trade.seller == "SUBMISSION":
+                    qty = -abs(qty)
+                ledger.add(trade.timestamp, trade.price, qty)
+                self.diagnostics.debug("trades", "Traded ", symbol, " price: ", trade.price, " volume: ", qty)
+        if self.diagnostics.enabled("trades", Diagnostics.DEBUG):
+            self.diagnostics.debug("trades", ledger.to_frame().tail())
 
     @staticmethod
-    def get_fair_price_asset(symbol, state):
-        order_depth: OrderDepth = state.order_depths[symbol]
-
-        average_bid = sum([k * v for k, v in order_depth.buy_orders.items()]) / (sum(order_depth.buy_orders.values()))
-        average_ask = sum([abs(k) * abs(v) for k, v in order_depth.sell_orders.items()]) / abs(
-            sum(order_depth.sell_orders.values()))
-        average_spread = average_ask - average_bid
-        vwap = (sum([k * v for k, v in order_depth.buy_orders.items()])
-                + sum([abs(k) * abs(v) for k, v in order_depth.sell_orders.items()])) \
-               / (sum(order_depth.buy_orders.values()) - sum(order_depth.sell_orders.values()))
-        average_value = vwap
-
-        return {"average_value": average_value, "average_spread": average_spread}
+    def compute_book_features(order_depth: OrderDepth):
+        # Sorts each side of the book once (best level first; the dicts give no guarantee on their order) and derives
+        # every feature the strategies need from the sorted levels and their running sums
+        bids = sorted(order_depth.buy_orders.items(), reverse=True)
+        asks = sorted(order_depth.sell_orders.items())
+
+        bid_value = 0
+        bid_volume = 0
+        for price, volume in bids:
+            bid_value += price * volume
+            bid_volume += volume
+        best_bid = bids[0][0] if bids else None
+        worst_bid = bids[-1][0] if bids else None
+
+        ask_value = 0
+        ask_volume = 0
+        for price, volume in asks:
+            ask_value += abs(price) * abs(volume)
+            ask_volume += abs(volume)
+        best_ask = asks[0][0] if asks else None
+        worst_ask = asks[-1][0] if asks else None
+
+        features = {"bids": bids, "asks": asks,  # [(price, volume)], best first; ask volumes negative as in the book
+                    "best_bid": best_bid, "best_ask": best_ask, "bid_volume": bid_volume, "ask_volume": ask_volume,
+                    "bid_levels": len(order_depth.buy_orders), "ask_levels": len(order_depth.sell_orders),
+                    "best_bid_vol": np.nan, "best_ask_vol": np.nan, "average_bid": np.nan, "average_ask": np.nan,
+                    "average_spread": np.nan, "vwap": np.nan, "vwap_ex_best_bid": np.nan,
+                    "vwap_ex_best_ask": np.nan, "mid_price": np.nan, "spread_market": np.nan, "buy_spread": np.nan,
+                    "sell_spread": np.nan, "imbalance": np.nan}
+        total_volume = bid_volume + ask_volume
+        if total_volume != 0:
+            features["vwap"] = (bid_value + ask_value) / total_volume
+            features["imbalance"] = (bid_volume - ask_volume) / total_volume
+        if best_bid is not None:
+            best_bid_vol = bids[0][1]
+            features["best_bid_vol"] = best_bid_vol
+            features["average_bid"] = bid_value / bid_volume
+            features["buy_spread"] = best_bid - worst_bid
+            if total_volume - best_bid_vol != 0:
+                features["vwap_ex_best_bid"] = (bid_value - best_bid * best_bid_vol + ask_value) / \
+                                               (total_volume - best_bid_vol)
+        if best_ask is not None:
+            best_ask_vol = asks[0][1]
+            features["best_ask_vol"] = best_ask_vol
+            features["average_ask"] = ask_value / ask_volume
+            features["sell_spread"] = worst_ask - best_ask
+            if total_volume - abs(best_ask_vol) != 0:
+                features["vwap_ex_best_ask"] = (bid_value + ask_value - abs(best_ask) * abs(best_ask_vol)) / \
+                                               (total_volume - abs(best_ask_vol))
+        if best_bid is not None and best_ask is not None:
+            features["average_spread"] = features["average_ask"] - features["average_bid"]
+            features["mid_price"] = (best_bid + best_ask) / 2
+            features["spread_market"] = best_ask - best_bid
+        return features
+
+    def get_book_features(self, symbol, state):
+        # Features of the book of a symbol, computed once per tick and shared by all the methods below
+        cached = self.book_features.get(symbol)
+        if cached is not None and cached[0] == state.timestamp:
+            return cached[1]
+        features = self.compute_book_features(state.order_depths[symbol])
+        self.book_features[symbol] = (state.timestamp, features)
+        return features
+
+    def get_fair_price_asset(self, symbol, state):
+        features = self.get_book_features(symbol, state)
+        return {"average_value": features["vwap"], "average_spread": features["average_spread"]}
 
     def get_alternate_buy_price_asset(self, symbol, state):
         order_depth: OrderDepth = state.order_depths[symbol]
+        alternate_buy_value = self.get_book_features(symbol, state)["vwap_ex_best_bid"]
 
-        keyy = max(order_depth.buy_orders.keys())
-        del order_depth.buy_orders[keyy]
-        #order_depth.buy_orders.items().pop(0)
-
-        vwap = (sum([k * v for k, v in order_depth.buy_orders.items()])
-                + sum([abs(k) * abs(v) for k, v in order_depth.sell_orders.items()])) \
-               / (sum(order_depth.buy_orders.values()) - sum(order_depth.sell_orders.values()))
-        alternate_buy_value = vwap
-
+        # The best bid is still removed from the book since the quoting that follows works on the trimmed book
+        del order_depth.buy_orders[self.get_book_features(symbol, state)["best_bid"]]
+        self.book_features.pop(symbol, None)
         return alternate_buy_value
 
     def get_alternate_sell_price_asset(self, symbol, state):
         order_depth: OrderDepth = state.order_depths[symbol]
+        alternate_sell_value = self.get_book_features(symbol, state)["vwap_ex_best_ask"]
 
-        keyy = min(order_depth.sell_orders.keys())
-        del order_depth.sell_orders[keyy]
-        #order_depth.sell_orders.items().pop(0)
-
-        vwap = (sum([k * v for k, v in order_depth.buy_orders.items()])
-                + sum([abs(k) * abs(v) for k, v in order_depth.sell_orders.items()])) \
-               / (sum(order_depth.buy_orders.values()) - sum(order_depth.sell_orders.values()))
-        alternate_sell_value = vwap
-
+        # Same as above for the best ask
+        del order_depth.sell_orders[self.get_book_features(symbol, state)["best_ask"]]
+        self.book_features.pop(symbol, None)
         return alternate_sell_value
 
-    @staticmethod
-    def get_mid_price(symbol, state):
-        order_depth = state.order_depths[symbol]
-
-        # First step: estimating the spread only if both sides present in the order book
-        mid_price = (min(order_depth.sell_orders.keys()) + max(order_depth.buy_orders.keys()))/2
-        best_bid = max(order_depth.buy_orders.keys())
-        best_bid_vol = order_depth.buy_orders[best_bid]
-        best_ask = min(order_depth.sell_orders.keys())
-        best_ask_vol = order_depth.sell_orders[best_ask]
-        return {"mid_price": mid_price, "best_bid": best_bid, "best_ask_vol": best_ask_vol, "best_ask": best_ask, "best_bid_vol": best_bid_vol}
+    def get_mid_price(self, symbol, state):
+        features = self.get_book_features(symbol, state)
+        return {"mid_price": features["mid_price"], "best_bid": features["best_bid"],
+                "best_ask_vol": features["best_ask_vol"], "best_ask": features["best_ask"],
+                "best_bid_vol": features["best_bid_vol"]}
 
-    @staticmethod
-    def estimate_spreads(symbol, current_pos, position_limit, state):
-        order_depth = state.order_depths[symbol]
+    def estimate_spreads(self, symbol, current_pos, position_limit, state):
+        features = self.get_book_features(symbol, state)
 
         # First step: estimating the spread only if both sides present in the order book
-        if (len(order_depth.buy_orders) != 0) & (len(order_depth.sell_orders) != 0):
-            spread_market = min(order_depth.sell_orders.keys()) - max(order_depth.buy_orders.keys())
-            buy_spread = max(order_depth.buy_orders.keys()) - min(order_depth.buy_orders.keys())
-            sell_spread = max(order_depth.sell_orders.keys()) - min(order_depth.sell_orders.keys())
+        if features["bid_levels"] != 0 and features["ask_levels"] != 0:
+            spread_market = features["spread_market"]
+            buy_spread = features["buy_spread"]
+            sell_spread = features["sell_spread"]
 
         else:  # ROOM FOR IMPROVEMENT: FIND THE SPREAD WHEN NO DATA IN THE CURRENT O.B
             buy_spread = 0
@@ -350,14 +974,15 @@ class Trader:
 
 # ------------------ PEARL & BANANA --------------------- 
     def get_orders_pearl_banana(self, symbol, state, current_pos, position_limit):
-        print("Position on " + symbol + " is: " + str(current_pos))
+        self.diagnostics.debug("pearls_bananas", "Position on ", symbol, " is: ", current_pos)
         # Initialize the list of Orders to be sent as an empty list
         orders: list[Order] = []
         order_depth: OrderDepth = state.order_depths[symbol]
 
         # Computing the fair value of the asset based on simple maths
-        buy_spread = max(order_depth.buy_orders.keys()) - min(order_depth.buy_orders.keys())
-        sell_spread = max(order_depth.sell_orders.keys()) - min(order_depth.sell_orders.keys())
+        features = self.get_book_features(symbol, state)
+        buy_spread = features["buy_spread"]
+        sell_spread = features["sell_spread"]
         market_values = self.get_fair_price_asset(symbol, state)
         market_spread = market_values["average_spread"]
 
@@ -367,15 +992,15 @@ class Trader:
                 fair_value_asset = self.get_alternate_buy_price_asset(symbol, state)
             if market_spread < sell_spread:
                 fair_value_asset = self.get_alternate_sell_price_asset(symbol, state)
-        print("The estimated fair price for " + symbol + " is: " + str(fair_value_asset))
+        self.diagnostics.debug("pearls_bananas", "The estimated fair price for ", symbol, " is: ", fair_value_asset)
 
         # Computing the spread & fair prices
         spreads = self.estimate_spreads(symbol, current_pos, position_limit, state)
         buy_spread = spreads["buy_spread"]
         sell_spread = spreads["sell_spread"]
         market_spread = spreads["spread_market"]
-        print("The estimated buy spread for " + symbol + " is: " + str(buy_spread))
-        print("The estimated sell spread for " + symbol + " is: " + str(sell_spread))
+        self.diagnostics.debug("pearls_bananas", "The estimated buy spread for ", symbol, " is: ", buy_spread)
+        self.diagnostics.debug("pearls_bananas", "The estimated sell spread for ", symbol, " is: ", sell_spread)
 
         # Estimating a profit range limits
 
@@ -387,61 +1012,76 @@ class Trader:
         buy_orders_to_place = [(key, value) for key, value in order_depth.sell_orders.items() if
                                key < fair_buy_price]
         if total_volume_buy != 0:
-            print(str(len(buy_orders_to_place)) + " buy orders to place:")
+            self.diagnostics.debug("pearls_bananas", len(buy_orders_to_place), " buy orders to place:")
             for buy_order_to_place in buy_orders_to_place:
                 buy_price = buy_order_to_place[0]
                 buy_volume = - buy_order_to_place[1]
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("pearls_bananas", "BUY ", symbol, " price: ", buy_price, " volume: ",
+                                       buy_volume)
 
         total_volume_sell = sum(
             value for key, value in order_depth.buy_orders.items() if key > fair_sell_price)
         sell_orders_to_place = [(key, value) for key, value in order_depth.buy_orders.items() if
                                 key > fair_sell_price]
         if total_volume_sell != 0:
-            print(str(len(sell_orders_to_place)) + " sell orders to place:")
+            self.diagnostics.debug("pearls_bananas", len(sell_orders_to_place), " sell orders to place:")
             for sell_order_to_place in sell_orders_to_place:
                 price = sell_order_to_place[0]
                 volume = - sell_order_to_place[1]
                 orders.append(Order(symbol, price, volume))
-                print("SELL " + str(symbol) + " price: ", str(price) + " volume: ", str(volume))
+                self.diagnostics.debug("pearls_bananas", "SELL ", symbol, " price: ", price, " volume: ", volume)
 
         if symbol == 'PEARLS':
             if (-current_pos)/position_limit < 0.75:
                 sell_price = mt.ceil(fair_value_asset)+ mt.ceil(market_spread/3)
                 sell_volume = - mt.floor((position_limit + current_pos)/2)
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("Trying to SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("pearls_bananas", "Trying to SELL ", symbol, " price: ", sell_price,
+                                       " volume: ", sell_volume)
         else:
             if (-current_pos)/position_limit < 0.75 and market_spread > 2:
                 sell_price = mt.floor(fair_value_asset) + mt.ceil(market_spread/3)
                 sell_volume = - mt.floor((position_limit + current_pos)/4)
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("Trying to BUY " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("pearls_bananas", "Trying to BUY ", symbol, " price: ", sell_price,
+                                       " volume: ", sell_volume)
             
         if symbol == 'PEARLS':
             if (current_pos)/position_limit < 0.75:
                 buy_price = mt.floor(fair_value_asset) - mt.ceil(market_spread/3)
                 buy_volume = mt.floor((position_limit - current_pos)/2)
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("Trying to BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("pearls_bananas", "Trying to BUY ", symbol, " price: ", buy_price, " volume: ",
+                                       buy_volume)
     
         else:
             if (current_pos)/position_limit < 0.75 and market_spread > 2:
                 buy_price = mt.floor(fair_value_asset) - mt.ceil(market_spread/3)
                 buy_volume = mt.floor((position_limit - current_pos)/4)
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("Trying to BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
-        return orders
+                self.diagnostics.debug("pearls_bananas", "Trying to BUY ", symbol, " price: ", buy_price, " volume: ",
+                                       buy_volume)
+        # The fair value goes with the orders: trim_orders drops the furthest from it first
+        return orders, fair_value_asset
 
 # ------------------ COCO & PINA --------------------- 
     def get_orders_coco_pina(self, symbol, state, current_pos, position_limit):
-        print("Position on " + symbol + " is: " + str(current_pos))
+        self.diagnostics.debug("coco_pina", "Position on ", symbol, " is: ", current_pos)
         orders: list[Order] = []
         order_depth: OrderDepth = state.order_depths[symbol]
 
-        buy_spread = max(order_depth.buy_orders.keys()) - min(order_depth.buy_orders.keys())
-        sell_spread = max(order_depth.sell_orders.keys()) - min(order_depth.sell_orders.keys())
+        # Once per tick, before any level is removed from the books
+        hedge = self.coco_pina_hedge
+        hedge.update(state.timestamp, self.get_mid_price("COCONUTS", state)["mid_price"],
+                     self.get_mid_price("PINA_COLADAS", state)["mid_price"])
+        if self.diagnostics.enabled("coco_pina", Diagnostics.DEBUG):
+            self.diagnostics.debug("coco_pina", "Hedge ratio: ", hedge.beta, " intercept: ", hedge.alpha, " z-score: ",
+                                   hedge.z_score())
+
+        features = self.get_book_features(symbol, state)
+        buy_spread = features["buy_spread"]
+        sell_spread = features["sell_spread"]
         market_values = self.get_fair_price_asset(symbol, state)
         market_spread = market_values["average_spread"]
 
@@ -451,25 +1091,18 @@ class Trader:
         if market_spread < sell_spread:
             fair_value_asset = self.get_alternate_sell_price_asset(symbol, state)
 
-        print("The estimated fair price for " + symbol + " is: " + str(fair_value_asset))
+        self.diagnostics.debug("coco_pina", "The estimated fair price for ", symbol, " is: ", fair_value_asset)
 
         spreads = self.estimate_spreads(symbol, current_pos, position_limit, state)
         buy_spread = spreads["buy_spread"]
         sell_spread = spreads["sell_spread"]
         market_spread = spreads["spread_market"]
-        print("The estimated buy spread for " + symbol + " is: " + str(buy_spread))
-        print("The estimated sell spread for " + symbol + " is: " + str(sell_spread))
+        self.diagnostics.debug("coco_pina", "The estimated buy spread for ", symbol, " is: ", buy_spread)
+        self.diagnostics.debug("coco_pina", "The estimated sell spread for ", symbol, " is: ", sell_spread)
 
         fair_buy_price = fair_value_asset - market_spread / 2  # Willing to buy lower than my valuation
         fair_sell_price = fair_value_asset + market_spread / 2
 
-        lower_limit = 1.8721
-        upper_limit = 1.8809
-        sigma = 0.001
-        fair_limit = 1.8762
-        inner_upper_limit = fair_limit + sigma
-        inner_lower_limit = fair_limit - sigma
-        
         if symbol == "COCONUTS":
             COCO_values = self.get_mid_price("COCONUTS",state)
             COCO_value = COCO_values["mid_price"]
@@ -485,50 +1118,55 @@ class Trader:
             best_PC_ask_vol = PC_values["best_ask_vol"]
             ratio = PC_value/COCO_value
             self.ratio_history.append(ratio)
-            print(ratio)
-            old_ratio_max = max(self.ratio_history[-5:])
-            old_ratio_min = min(self.ratio_history[-5:])
-            print(old_ratio_max)
-            print(old_ratio_min)
-
-            if (PC_value/COCO_value) > upper_limit and old_ratio_min == ratio:
+            self.diagnostics.debug("coco_pina", ratio)
+            old_ratio_max = self.ratio_history.max()
+            old_ratio_min = self.ratio_history.min()
+            self.diagnostics.debug("coco_pina", old_ratio_max)
+            self.diagnostics.debug("coco_pina", old_ratio_min)
+            signals = self.get_coco_pina_signals(ratio, old_ratio_min, old_ratio_max)
+
+            if signals["short_pc"]:
                 #Then we want to sell PC and buy COCO
                 buy_price = best_COCO_ask
-                buy_volume = min(-best_COCO_ask_vol,round(best_PC_bid_vol*fair_limit))
+                buy_volume = min(-best_COCO_ask_vol,round(best_PC_bid_vol*signals["hedge_ratio"]))
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ", buy_volume)
 
-            elif (PC_value/COCO_value) < lower_limit and old_ratio_max == ratio:
+            elif signals["long_pc"]:
                 #Because the spread is always thin we just buy the best offer
                 #on the market and even double the volume depending on hwo large the overhaul is
                 sell_price = best_COCO_bid
-                sell_volume = -min(best_COCO_bid_vol,-round(best_PC_ask_vol*fair_limit)) #making sure the position is balanced
+                sell_volume = -min(best_COCO_bid_vol,-round(best_PC_ask_vol*signals["hedge_ratio"])) #making sure the position is balanced
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", sell_price, " volume: ", sell_volume)
 
                 # COCO_value = COCO_value /1.8764*(PC_value/COCO_value)
                 #Then we want to sell COCO and buy PC
-            elif inner_upper_limit > (PC_value/COCO_value) > inner_lower_limit:
+            elif signals["unwind"]:
                 if current_pos > 0:
-                    sell_price = max(order_depth.buy_orders.keys())+1
+                    sell_price = self.get_book_features(symbol, state)["best_bid"] + 1
                     sell_volume = -current_pos + round(current_pos/8)#* (1.87294-PC_value/COCO_value)/0.003696
                     orders.append(Order(symbol, sell_price, sell_volume))
-                    print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
-                    sell_price = max(order_depth.buy_orders.keys())
+                    self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", sell_price, " volume: ",
+                                           sell_volume)
+                    sell_price = self.get_book_features(symbol, state)["best_bid"]
                     sell_volume = -round(current_pos/8)#* (1.87294-PC_value/COCO_value)/0.003696
                     orders.append(Order(symbol, sell_price, sell_volume))
-                    print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))        
+                    self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", sell_price, " volume: ",
+                                           sell_volume)        
                 if current_pos < 0:
-                    buy_price = min(order_depth.sell_orders.keys())-1
+                    buy_price = self.get_book_features(symbol, state)["best_ask"] - 1
                     buy_volume = -current_pos + round(current_pos/8)
                     orders.append(Order(symbol, buy_price, buy_volume))
-                    print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
-                    buy_price = min(order_depth.sell_orders.keys())
+                    self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ",
+                                           buy_volume)
+                    buy_price = self.get_book_features(symbol, state)["best_ask"]
                     buy_volume = -round(current_pos/8)
                     orders.append(Order(symbol, buy_price, buy_volume))
-                    print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                    self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ",
+                                           buy_volume)
 
-        print("The estimated fair price for " + symbol + " is: " + str(fair_value_asset))
+        self.diagnostics.debug("coco_pina", "The estimated fair price for ", symbol, " is: ", fair_value_asset)
 
         if symbol == "PINA_COLADAS":
             COCO_values = self.get_mid_price("COCONUTS",state)
@@ -545,44 +1183,49 @@ class Trader:
             best_PC_ask_vol = PC_values["best_ask_vol"]
             ratio = PC_value/COCO_value
             self.ratio_history.append(ratio)
-            old_ratio_max = max(self.ratio_history[-5:])
-            old_ratio_min = min(self.ratio_history[-5:])
-            print(ratio)
-            print(old_ratio_max)
-            print(old_ratio_min)
-
-            if PC_value/COCO_value > upper_limit and old_ratio_min == ratio:
+            old_ratio_max = self.ratio_history.max()
+            old_ratio_min = self.ratio_history.min()
+            self.diagnostics.debug("coco_pina", ratio)
+            self.diagnostics.debug("coco_pina", old_ratio_max)
+            self.diagnostics.debug("coco_pina", old_ratio_min)
+            signals = self.get_coco_pina_signals(ratio, old_ratio_min, old_ratio_max)
+
+            if signals["short_pc"]:
                 sell_price = best_PC_bid
-                sell_volume =  -min(best_PC_bid_vol, round(-best_COCO_ask_vol/fair_limit)) #* (1.87294-PC_value/COCO_value)/0.003696
+                sell_volume =  -min(best_PC_bid_vol, round(-best_COCO_ask_vol/signals["hedge_ratio"])) #* (1.87294-PC_value/COCO_value)/0.003696
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", sell_price, " volume: ", sell_volume)
 
-            elif PC_value/COCO_value < lower_limit and old_ratio_max == ratio:
+            elif signals["long_pc"]:
                 buy_price = best_PC_ask
-                buy_volume = min(-best_PC_ask_vol, round(best_COCO_bid_vol/fair_limit)) 
+                buy_volume = min(-best_PC_ask_vol, round(best_COCO_bid_vol/signals["hedge_ratio"])) 
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
-            elif inner_upper_limit > (PC_value/COCO_value) > inner_lower_limit:
+                self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ", buy_volume)
+            elif signals["unwind"]:
                 if current_pos > 0:
-                    sell_price = max(order_depth.buy_orders.keys())+1
+                    sell_price = self.get_book_features(symbol, state)["best_bid"] + 1
                     sell_volume = -current_pos#* (1.87294-PC_value/COCO_value)/0.003696
                     orders.append(Order(symbol, sell_price, sell_volume))
-                    print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
-                    sell_price = max(order_depth.buy_orders.keys())
+                    self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", sell_price, " volume: ",
+                                           sell_volume)
+                    sell_price = self.get_book_features(symbol, state)["best_bid"]
                     sell_volume = -current_pos/8#* (1.87294-PC_value/COCO_value)/0.003696
                     orders.append(Order(symbol, sell_price, sell_volume))
-                    print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                    self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", sell_price, " volume: ",
+                                           sell_volume)
                 if current_pos < 0:
-                    buy_price = min(order_depth.sell_orders.keys())
+                    buy_price = self.get_book_features(symbol, state)["best_ask"]
                     buy_volume = -current_pos/8
                     orders.append(Order(symbol, buy_price, buy_volume))
-                    print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
-                    buy_price = min(order_depth.sell_orders.keys())-1
+                    self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ",
+                                           buy_volume)
+                    buy_price = self.get_book_features(symbol, state)["best_ask"] - 1
                     buy_volume = -current_pos
                     orders.append(Order(symbol, buy_price, buy_volume))
-                    print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                    self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ",
+                                           buy_volume)
 
-        print("The estimated fair price for " + symbol + " is: " + str(fair_value_asset))    
+        self.diagnostics.debug("coco_pina", "The estimated fair price for ", symbol, " is: ", fair_value_asset)    
             
         if symbol == 'PEARLS' or symbol == 'BANANAS':
 
@@ -592,12 +1235,13 @@ class Trader:
             buy_orders_to_place = [(key, value) for key, value in order_depth.sell_orders.items() if
                                 key < fair_buy_price]
             if total_volume_buy != 0:
-                print(str(len(buy_orders_to_place)) + " buy orders to place:")
+                self.diagnostics.debug("coco_pina", len(buy_orders_to_place), " buy orders to place:")
                 for buy_order_to_place in buy_orders_to_place:
                     buy_price = buy_order_to_place[0]
                     buy_volume = - buy_order_to_place[1]
                     orders.append(Order(symbol, buy_price, buy_volume))
-                    print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                    self.diagnostics.debug("coco_pina", "BUY ", symbol, " price: ", buy_price, " volume: ",
+                                           buy_volume)
 
         if symbol == 'PEARLS' or symbol == 'BANANAS':
 
@@ -606,26 +1250,28 @@ class Trader:
             sell_orders_to_place = [(key, value) for key, value in order_depth.buy_orders.items() if
                                     key > fair_sell_price]
             if total_volume_sell != 0:
-                print(str(len(sell_orders_to_place)) + " sell orders to place:")
+                self.diagnostics.debug("coco_pina", len(sell_orders_to_place), " sell orders to place:")
                 for sell_order_to_place in sell_orders_to_place:
                     price = sell_order_to_place[0]
                     volume = - sell_order_to_place[1]
                     orders.append(Order(symbol, price, volume))
-                    print("SELL " + str(symbol) + " price: ", str(price) + " volume: ", str(volume))
+                    self.diagnostics.debug("coco_pina", "SELL ", symbol, " price: ", price, " volume: ", volume)
 
         if symbol == 'PEARLS':
             if (-current_pos)/position_limit < 0.75:
                 sell_price = 10004
                 sell_volume = - mt.floor((position_limit + current_pos)/2)
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("Trying to SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("coco_pina", "Trying to SELL ", symbol, " price: ", sell_price, " volume: ",
+                                       sell_volume)
         
         elif symbol == 'BANANAS':
             if (-current_pos)/position_limit < 0.75 and market_spread > 2:
                 sell_price = mt.ceil(fair_value_asset)+ mt.ceil(market_spread/2)
                 sell_volume = - mt.floor((position_limit + current_pos)/2)
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("Trying to SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("coco_pina", "Trying to SELL ", symbol, " price: ", sell_price, " volume: ",
+                                       sell_volume)
 
 
         if symbol == 'PEARLS':
@@ -633,23 +1279,45 @@ class Trader:
                 buy_price = 9996
                 buy_volume = mt.floor((position_limit - current_pos)/2)
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("Trying to BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("coco_pina", "Trying to BUY ", symbol, " price: ", buy_price, " volume: ",
+                                       buy_volume)
        
         elif symbol == 'BANANAS':
             if (current_pos)/position_limit < 0.75 and market_spread > 2:
                 buy_price = mt.floor(fair_value_asset) - mt.ceil(market_spread/2)
                 buy_volume = mt.floor((position_limit - current_pos)/2)
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("Trying to BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("coco_pina", "Trying to BUY ", symbol, " price: ", buy_price, " volume: ",
+                                       buy_volume)
         
-        return orders
+        return orders, fair_value_asset
+
+    def get_coco_pina_signals(self, ratio, old_ratio_min, old_ratio_max):
+        # When to short PINA_COLADAS against COCONUTS, when to go long, when to unwind, and how many COCONUTS per
+        # PINA_COLADAS. "ratio": fixed bands on the ratio of the mid prices, entering on a new extremum of the last
+        # ratios; "kalman": bands on the z-score of the residual of the hedge filter, hedging with its ratio
+        if self.params["coco_pina_signal"] == "kalman":
+            z_score = self.coco_pina_hedge.z_score()
+            entry_z = self.params["coco_pina_entry_z"]
+            return {"short_pc": z_score > entry_z, "long_pc": z_score < -entry_z,
+                    "unwind": abs(z_score) < self.params["coco_pina_exit_z"], "hedge_ratio": self.coco_pina_hedge.beta}
+
+        lower_limit = 1.8721
+        upper_limit = 1.8809
+        sigma = 0.001
+        fair_limit = 1.8762
+        inner_upper_limit = fair_limit + sigma
+        inner_lower_limit = fair_limit - sigma
+        return {"short_pc": ratio > upper_limit and old_ratio_min == ratio,
+                "long_pc": ratio < lower_limit and old_ratio_max == ratio,
+                "unwind": inner_upper_limit > ratio > inner_lower_limit, "hedge_ratio": fair_limit}
 
 # ------------------ DIVING GEAR --------------------- 
     def get_orders_diving_gear(self, symbol, state, current_pos, position_limit):
         # This method gets the fair price using vwap method and then computes the spread based on our current position
 
         # print("Both sides of the market are quoted for " + symbol)
-        print("Position on " + symbol + " is: " + str(current_pos))
+        self.diagnostics.debug("diving_gear", "Position on ", symbol, " is: ", current_pos)
         # Initialize the list of Orders to be sent as an empty list
         orders: list[Order] = []
         order_depth: OrderDepth = state.order_depths[symbol]
@@ -661,7 +1329,8 @@ class Trader:
         best_GEAR_bid_vol = GEAR_values["best_bid_vol"]
         best_GEAR_ask_vol = GEAR_values["best_ask_vol"]
 
-        self.Gear_price_history.append(GEAR_value)
+        if self.Gear_price_history.capacity != self.params["gear_average_window"]:
+            self.Gear_price_history = RollingWindow(self.params["gear_average_window"])
 
         current_dolphins = state.observations["DOLPHIN_SIGHTINGS"]
         if len(self.dolphin_sightings_history) > 2:
@@ -674,18 +1343,20 @@ class Trader:
         dolphin_change = current_dolphins-previous_dolphins
         self.dolphin_change_history.append(dolphin_change)
         #print(self.dolphin_sightings_history[-10:])
+        # One price per tick, averaged over the last gear_average_window ticks. Until the rolling window, each price was
+        # appended twice and popped once: the list grew by one a tick and the average covered the second half of the
+        # ticks so far, so the exits below now react to a much shorter average
         self.Gear_price_history.append(GEAR_value)
-        if len(self.Gear_price_history) > 25:
-            self.Gear_price_history.pop(0)
-        # then you just
-        last_25_avg = np.mean(self.Gear_price_history)
+        last_25_avg = self.Gear_price_history.mean()
         # gear_price_series = pd.Series(self.Gear_price_history)
         # ratios_mav5 = gear_price_series.rolling(window=5, center = False).mean()
         # current_ratio = ratios_mav5.values[-1:]
 
         #print(current_ratio)
 
-        if current_dolphins - previous_dolphins >= 10:
+        jump_threshold = self.params["gear_jump_threshold"]
+        jump_cooldown = self.params["gear_jump_cooldown"]
+        if current_dolphins - previous_dolphins >= jump_threshold:
             jump_timestamp = state.timestamp
             self.jump_timestamps.append(jump_timestamp)
             buy_orders_to_place = [(key, value) for key, value in order_depth.sell_orders.items()]
@@ -693,52 +1364,53 @@ class Trader:
                 buy_price = buy_order_to_place[0]
                 buy_volume = - buy_order_to_place[1]
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("diving_gear", "BUY ", symbol, " price: ", buy_price, " volume: ", buy_volume)
 
-        if previous_dolphins - previous_dolphins2 >= 10:
+        if previous_dolphins - previous_dolphins2 >= jump_threshold:
             buy_orders_to_place = [(key, value) for key, value in order_depth.sell_orders.items()]
             for buy_order_to_place in buy_orders_to_place:
                 buy_price = buy_order_to_place[0]
                 buy_volume = - buy_order_to_place[1]
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("diving_gear", "BUY ", symbol, " price: ", buy_price, " volume: ", buy_volume)
 
 
-        if current_dolphins - previous_dolphins <= -10:
+        if current_dolphins - previous_dolphins <= -jump_threshold:
             jump_timestamp = state.timestamp
             self.jump_timestamps.append(jump_timestamp)
             sell_orders_to_place = [(key, value) for key, value in order_depth.buy_orders.items()]
-            print(str(len(sell_orders_to_place)) + " sell orders to place:")
+            self.diagnostics.debug("diving_gear", len(sell_orders_to_place), " sell orders to place:")
 
             for sell_order_to_place in sell_orders_to_place:
                 price = sell_order_to_place[0]
                 volume = - sell_order_to_place[1]
                 orders.append(Order(symbol, price, volume))
-                print("SELL " + str(symbol) + " price: ", str(price) + " volume: ", str(volume))
+                self.diagnostics.debug("diving_gear", "SELL ", symbol, " price: ", price, " volume: ", volume)
 
-        if previous_dolphins - previous_dolphins2 <= -10:
+        if previous_dolphins - previous_dolphins2 <= -jump_threshold:
             sell_orders_to_place = [(key, value) for key, value in order_depth.buy_orders.items()]
-            print(str(len(sell_orders_to_place)) + " sell orders to place:")
+            self.diagnostics.debug("diving_gear", len(sell_orders_to_place), " sell orders to place:")
 
             for sell_order_to_place in sell_orders_to_place:
                 price = sell_order_to_place[0]
                 volume = - sell_order_to_place[1]
                 orders.append(Order(symbol, price, volume))
-                print("SELL " + str(symbol) + " price: ", str(price) + " volume: ", str(volume))
+                self.diagnostics.debug("diving_gear", "SELL ", symbol, " price: ", price, " volume: ", volume)
 
         if current_pos > 0:
-            if GEAR_value < last_25_avg and (state.timestamp - self.jump_timestamps[-1])> 10000:
+            if GEAR_value < last_25_avg and (state.timestamp - self.jump_timestamps[-1]) > jump_cooldown:
                 sell_price = best_GEAR_bid
                 sell_volume = -best_GEAR_bid_vol
                 orders.append(Order(symbol, sell_price, sell_volume))
-                print("SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                self.diagnostics.debug("diving_gear", "SELL ", symbol, " price: ", sell_price, " volume: ",
+                                       sell_volume)
         
         if current_pos < 0:    
-            if GEAR_value > last_25_avg and (state.timestamp - self.jump_timestamps[-1])> 10000:
+            if GEAR_value > last_25_avg and (state.timestamp - self.jump_timestamps[-1]) > jump_cooldown:
                 buy_price = best_GEAR_ask
                 buy_volume = -best_GEAR_ask_vol
                 orders.append(Order(symbol, buy_price, buy_volume))
-                print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                self.diagnostics.debug("diving_gear", "BUY ", symbol, " price: ", buy_price, " volume: ", buy_volume)
         
         return orders
 
@@ -751,33 +1423,35 @@ class Trader:
         # df_berries = self.df_data_market[mask_berries]
 
         # Getting the order book:
-        print("The order book for BERRIES is:")
-        order_book_berries = state.order_depths["BERRIES"]
+        self.diagnostics.debug("berries", "The order book for BERRIES is:")
+        book_berries = self.get_book_features("BERRIES", state)
 
         # Getting our last trades on BERRIES
         # own_trades = self.get_own_trades_symbol("BERRIES", state)
 
         # Aaand getting our current position on BERRIES atm
         current_pos_berries = self.get_pos_symbol("BERRIES", state)
-        print("The current position on BERRIES is:" + str(current_pos_berries))
+        self.diagnostics.debug("berries", "The current position on BERRIES is:", current_pos_berries)
 
         # PARAMETERS: can be modified when backtesting: max sizing we want to fill for a price and dt between trades
-        max_volume_per_order = 1
+        max_volume_per_order = self.params["berries_max_volume_per_order"]
+        timestamp_delta = self.params["berries_timestamp_delta"]
+        short_timestamp_delta = self.params["berries_short_timestamp_delta"]
 
         # # We first begin by the building our long position
         if 100000 < state.timestamp < 350000:
-            if (state.timestamp % 1000) == 0:
+            if (state.timestamp % timestamp_delta) == 0:
                 # Best ask; we want to be filled at the lowest available price
-                ask_price_1 = min(order_book_berries.sell_orders.keys())
+                ask_price_1 = book_berries["best_ask"]
                 # ask_volume_1 = order_book_berries.sell_orders.get(ask_price_1)
                 orders_berries.append(Order("BERRIES", ask_price_1, max_volume_per_order))
 
         # Now looking to build the short position
         if 450000 <= state.timestamp <= 550000:
             # if 10000 < state.timestamp < 350000:
-            if (state.timestamp % 200) == 0:
+            if (state.timestamp % short_timestamp_delta) == 0:
                 # Best ask; we want to be filled at the lowest available price
-                bid_price_1 = max(order_book_berries.buy_orders.keys())
+                bid_price_1 = book_berries["best_bid"]
                 # ask_volume_1 = order_book_berries.sell_orders.get(ask_price_1)
                 orders_berries.append(Order("BERRIES", bid_price_1, - max_volume_per_order))
 
@@ -785,14 +1459,14 @@ class Trader:
         if 700000 <= state.timestamp <= 1000000:
             # if 100000 < state.timestamp < 350000:
             if (state.timestamp <= 775000) or (state.timestamp >= 825000):  # 350k timestamps to buy back 230 position
-                if (state.timestamp % 1000) == 0:  # leaves 0 opened in the end
+                if (state.timestamp % timestamp_delta) == 0:  # leaves 0 opened in the end
                     # Best ask; we want to be filled at the lowest available price
-                    ask_price_1 = min(order_book_berries.sell_orders.keys())
+                    ask_price_1 = book_berries["best_ask"]
                     # ask_volume_1 = order_book_berries.sell_orders.get(ask_price_1)
                     orders_berries.append(Order("BERRIES", ask_price_1, max_volume_per_order))
 
-        print("The orders we submitted are:")
-        print(orders_berries)
+        self.diagnostics.debug("berries", "The orders we submitted are:")
+        self.diagnostics.debug("berries", orders_berries)
         return orders_berries
 
 
@@ -818,70 +1492,58 @@ class Trader:
         # orders_pinas: list[Order] = []
 
         dic_orders = {"DIP": None, "PICNIC_BASKET": None, "UKULELE": None, "BAGUETTE": None}  # Initiating the output
-        df_market = self.df_data_market
-
-        # Getting the stored data
-        mask_baguette = (df_market["symbol"] == "BAGUETTE")
-        df_baguette = df_market[mask_baguette].reset_index(drop=True)
-
-        mask_ukulele = (df_market["symbol"] == "UKULELE")
-        df_ukulele = df_market[mask_ukulele].reset_index(drop=True)
-
-        mask_dip = (df_market["symbol"] == "DIP")
-        df_dip = df_market[mask_dip].reset_index(drop=True)
-
-        mask_basket = (df_market["symbol"] == "PICNIC_BASKET")
-        df_basket = df_market[mask_basket].reset_index(drop=True)
-
-        df_replication = pd.DataFrame()
-        df_replication["min_buy_price_basket"] = 2 * df_baguette["ask_price_1"] + df_ukulele["ask_price_1"] + 4 * \
-                                                 df_dip["ask_price_1"]
+        store = self.market_store
+        replication = self.basket_replication
 
-        df_replication["mid_price"] = 2 * df_baguette["mid_price"] + df_ukulele["mid_price"] + 4 * \
-                                      df_dip["mid_price"]
-        df_replication["spread"] = df_basket["bid_price_1"] - df_replication["min_buy_price_basket"]
+        # Updating the replication with the last stored snapshot of each leg
+        mid_prices = {symbol: store.history(symbol).last("mid_price") for symbol in store.symbols}
+        ask_prices = {symbol: store.history(symbol).last("ask_price_1") for symbol in store.symbols}
+        replication.update(state.timestamp, mid_prices, ask_prices)
 
-        # Getting the order books
-        order_book_baguette = state.order_depths["BAGUETTE"]
-        order_book_ukulele = state.order_depths["UKULELE"]
-        order_book_dip = state.order_depths["DIP"]
-        order_book_basket = state.order_depths["PICNIC_BASKET"]
+        # Getting the sorted order books
+        book_baguette = self.get_book_features("BAGUETTE", state)
+        book_ukulele = self.get_book_features("UKULELE", state)
+        book_dip = self.get_book_features("DIP", state)
+        book_basket = self.get_book_features("PICNIC_BASKET", state)
 
-        if len(df_basket) > 1:  # we don't do anything until we have at least 200 datapoints
+        if replication.count > 1:  # we don't do anything until we have at least 200 datapoints
             # Getting positions
             current_pos_baguette = self.get_pos_symbol("BAGUETTE", state)
-            print("The current position on BAGUETTE is: " + str(current_pos_baguette))
+            self.diagnostics.debug("basket", "The current position on BAGUETTE is: ", current_pos_baguette)
             current_pos_ukulele = self.get_pos_symbol("UKULELE", state)
-            print("The current position on UKULELE is: " + str(current_pos_ukulele))
+            self.diagnostics.debug("basket", "The current position on UKULELE is: ", current_pos_ukulele)
             current_pos_dip = self.get_pos_symbol("DIP", state)
-            print("The current position on DIP is: " + str(current_pos_dip))
+            self.diagnostics.debug("basket", "The current position on DIP is: ", current_pos_dip)
             current_pos_basket = self.get_pos_symbol("PICNIC_BASKET", state)
-            print("The current position on PICNIC_BASKET is: " + str(current_pos_basket))
+            self.diagnostics.debug("basket", "The current position on PICNIC_BASKET is: ", current_pos_basket)
 
-            log_mid_prices_basket = np.log(df_basket["mid_price"])
-            log_mid_prices_replication = np.log(df_replication["mid_price"])
-            spread = log_mid_prices_basket.values[-1] - log_mid_prices_replication.values[-1]
-            print("The spread is: " + str(round(spread, 4)))
+            spread = replication.spread
+            if self.diagnostics.enabled("basket", Diagnostics.DEBUG):
+                self.diagnostics.debug("basket", "The spread is: ", round(spread, 4))
 
-            if spread > 0.0075:  # I don't want to offset my positions here, they can only increase
-                print("We're in short basket zone.")
+            short_band = self.params["basket_short_band"]
+            short_full_band = self.params["basket_short_full_band"]
+            long_band = self.params["basket_long_band"]
+            if spread > short_band:  # I don't want to offset my positions here, they can only increase
+                self.diagnostics.info("basket", "We're in short basket zone.")
+                short_scale = (spread ** 2 - short_band ** 2) / (short_full_band ** 2 - short_band ** 2)
 
-                desired_pos_basket = - 35 * (spread ** 2 - 0.0075 ** 2) / (0.01 ** 2 - 0.0075 ** 2) - 35
-                desired_pos_baguette = 70 * (spread ** 2 - 0.0075 ** 2) / (0.01 ** 2 - 0.0075 ** 2) + 70
-                desired_pos_dip = 140 * (spread ** 2 - 0.0075 ** 2) / (0.01 ** 2 - 0.0075 ** 2) + 140
-                desired_pos_ukulele = 35 * (spread ** 2 - 0.0075 ** 2) / (0.01 ** 2 - 0.0075 ** 2) + 35
+                desired_pos_basket = - 35 * short_scale - 35
+                desired_pos_baguette = 70 * short_scale + 70
+                desired_pos_dip = 140 * short_scale + 140
+                desired_pos_ukulele = 35 * short_scale + 35
 
                 volume_to_send_basket = min(0, desired_pos_basket - current_pos_basket)
                 volume_to_send_baguette = max(0, desired_pos_baguette - current_pos_baguette)
                 volume_to_send_dip = max(0, desired_pos_dip - current_pos_dip)
                 volume_to_send_ukulele = max(0, desired_pos_ukulele - current_pos_ukulele)
 
-            elif spread < 0.0025:  # I don't want to offset my positions here, they can only increase
-                print("We're in long basket zone.")
-                desired_pos_basket = - 35 * spread ** 2 / (0.0025 ** 2) + 70
-                desired_pos_baguette = 70 * spread ** 2 / (0.0025 ** 2) - 140
-                desired_pos_dip = 140 * spread ** 2 / (0.0025 ** 2) - 280
-                desired_pos_ukulele = 35 * spread ** 2 / (0.0025 ** 2) - 70
+            elif spread < long_band:  # I don't want to offset my positions here, they can only increase
+                self.diagnostics.info("basket", "We're in long basket zone.")
+                desired_pos_basket = - 35 * spread ** 2 / (long_band ** 2) + 70
+                desired_pos_baguette = 70 * spread ** 2 / (long_band ** 2) - 140
+                desired_pos_dip = 140 * spread ** 2 / (long_band ** 2) - 280
+                desired_pos_ukulele = 35 * spread ** 2 / (long_band ** 2) - 70
 
                 volume_to_send_basket = max(0, desired_pos_basket - current_pos_basket)
                 volume_to_send_baguette = min(0, desired_pos_baguette - current_pos_baguette)
@@ -889,7 +1551,7 @@ class Trader:
                 volume_to_send_ukulele = min(0, desired_pos_ukulele - current_pos_ukulele)
 
             else:  # where the fun begins
-                print("We're in holding zone.")
+                self.diagnostics.info("basket", "We're in holding zone.")
 
                 desired_pos_basket = current_pos_basket
                 desired_pos_ukulele = current_pos_ukulele
@@ -901,50 +1563,27 @@ class Trader:
                 volume_to_send_dip = 0
                 volume_to_send_ukulele = 0
 
-            print("The volume to send on UKULELE is: " + str(volume_to_send_ukulele))
-            print("The volume to send on DIP is: " + str(volume_to_send_dip))
-            print("The volume to send on BAGUETTE is: " + str(volume_to_send_baguette))
-            print("The volume to send on BASKET is: " + str(volume_to_send_basket))
-
-            print("The desired position on UKULELE is: " + str(desired_pos_ukulele))
-            print("The desired position on DIP is: " + str(desired_pos_dip))
-            print("The desired position on BAGUETTE is: " + str(desired_pos_baguette))
-            print("The desired position on BASKET is: " + str(desired_pos_basket))
-
-            orders_basket = self.get_orders_with_volume("PICNIC_BASKET", order_book_basket, volume_to_send_basket)
-            orders_baguette = self.get_orders_with_volume("BAGUETTE", order_book_baguette, volume_to_send_baguette)
-            orders_dip = self.get_orders_with_volume("DIP", order_book_dip, volume_to_send_dip)
-            orders_ukulele = self.get_orders_with_volume("UKULELE", order_book_ukulele, volume_to_send_ukulele)
-
-            dic_orders["PICNIC_BASKET"] = orders_basket
-            dic_orders["BAGUETTE"] = orders_baguette
-            dic_orders["DIP"] = orders_dip
-            dic_orders["UKULELE"] = orders_ukulele
-
-            print("The orders sent are:")
-            print(dic_orders)
+            self.diagnostics.debug("basket", "The volume to send on UKULELE is: ", volume_to_send_ukulele)
+            self.diagnostics.debug("basket", "The volume to send on DIP is: ", volume_to_send_dip)
+            self.diagnostics.debug("basket", "The volume to send on BAGUETTE is: ", volume_to_send_baguette)
+            self.diagnostics.debug("basket", "The volume to send on BASKET is: ", volume_to_send_basket)
+
+            self.diagnostics.debug("basket", "The desired position on UKULELE is: ", desired_pos_ukulele)
+            self.diagnostics.debug("basket", "The desired position on DIP is: ", desired_pos_dip)
+            self.diagnostics.debug("basket", "The desired position on BAGUETTE is: ", desired_pos_baguette)
+            self.diagnostics.debug("basket", "The desired position on BASKET is: ", desired_pos_basket)
+
+            # Crossing the four books together, in whole baskets
+            plan = self.basket_planner.plan(
+                {"PICNIC_BASKET": book_basket, "BAGUETTE": book_baguette, "DIP": book_dip, "UKULELE": book_ukulele},
+                {"PICNIC_BASKET": volume_to_send_basket, "BAGUETTE": volume_to_send_baguette,
+                 "DIP": volume_to_send_dip, "UKULELE": volume_to_send_ukulele},
+                {"PICNIC_BASKET": current_pos_basket, "BAGUETTE": current_pos_baguette, "DIP": current_pos_dip,
+                 "UKULELE": current_pos_ukulele}, self.limits)
+            self.diagnostics.debug("basket", "Baskets crossed: ", plan["units"], ", slippage: ", plan["slippage"])
+
+            dic_orders.update(plan["orders"])
+
+            self.diagnostics.debug("basket", "The orders sent are:")
+            self.diagnostics.debug("basket", dic_orders)
         return dic_orders
-
-    @staticmethod
-    def get_orders_with_volume(symbol, order_book, volume_to_send):
-        orders: list[Order] = []
-        total_volume_sent = 0
-        if volume_to_send > 0:
-            for price, volume in sorted(order_book.sell_orders.items()):
-                if abs(total_volume_sent) < abs(volume_to_send):
-                    volume_to_submit = min(abs(volume), abs(volume_to_send),
-                                           abs(volume_to_send - total_volume_sent))
-                    total_volume_sent += volume_to_submit
-                    volume_to_send -= volume_to_submit
-                    orders.append(Order(symbol, price, volume_to_submit))  # and a + here
-
-        # On this side, we want to sell cocos & buy pinas
-        elif volume_to_send < 0:
-            for price, volume in sorted(order_book.buy_orders.items(), reverse=True):
-                if abs(total_volume_sent) < abs(volume_to_send):
-                    volume_to_submit = min(abs(volume), abs(volume_to_send),
-                                           abs(volume_to_send - total_volume_sent))
-                    total_volume_sent += volume_to_submit
-                    volume_to_send += volume_to_submit
-                    orders.append(Order(symbol, price, - volume_to_submit))  # and a + here
-        return orders
@@ -4,11 +4,84 @@ import pandas as pd
 import numpy as np
 import statistics as stat
 import math as mt
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+
+class PriceLevelHistogram:
+    # Volume seen at each price level of one side of a book, over all the snapshots so far, updated as each snapshot
+    # arrives instead of being regrouped from the whole history. Optionally the volumes decay by `decay` per snapshot,
+    # or only the last `window` snapshots are counted. The prices are kept sorted with the prefix sums of their
+    # volumes (rebuilt at most once per snapshot), so the volume above a price is a binary search
+    def __init__(self, decay: float = None, window: int = None):
+        self.decay = decay
+        self.window = window
+        self.snapshots = deque()  # levels of the snapshots in the window, to take them out when they expire
+        self.volumes = {}  # price -> volume, times `scale` when decaying
+        self.prices = []  # sorted
+        self.scale = 1.0  # 1 / decay ** number of snapshots: older volumes shrink without touching them
+        self.cumulative = None  # prefix sums of the volumes of `prices`, None when out of date
+
+    def __len__(self):
+        return len(self.prices)
+
+    def add_snapshot(self, levels):
+        # levels: (price, volume) of the side of the book at this timestamp
+        if self.decay is not None:
+            self.scale /= self.decay
+            if self.scale > 1e100:  # bringing the stored volumes, and those of the window, back to the current scale
+                self.volumes = {price: volume / self.scale for price, volume in self.volumes.items()}
+                self.snapshots = deque([[(price, volume / self.scale) for price, volume in snapshot]
+                                        for snapshot in self.snapshots])
+                self.scale = 1.0
+        for price, volume in levels:
+            self.add(price, volume * self.scale)
+        if self.window is not None:
+            self.snapshots.append([(price, volume * self.scale) for price, volume in levels])
+            if len(self.snapshots) > self.window:
+                for price, volume in self.snapshots.popleft():
+                    self.add(price, -volume)
+        self.cumulative = None
+
+    def add(self, price, volume):
+        if price not in self.volumes:
+            insort(self.prices, price)
+            self.volumes[price] = 0
+        self.volumes[price] += volume
+        # A level whose snapshots all expired leaves the histogram; with decay the subtraction may leave a rounding
+        # error rather than an exact 0
+        if abs(self.volumes[price]) <= 1e-9 * self.scale:
+            del self.volumes[price]
+            del self.prices[bisect_left(self.prices, price)]
+
+    def volume(self, price):
+        return self.volumes.get(price, 0) / self.scale
+
+    def volume_above(self, price):
+        # Total volume at the prices strictly above `price`
+        if self.cumulative is None:
+            self.cumulative = np.cumsum([self.volumes[level] for level in self.prices])
+        i = bisect_right(self.prices, price)
+        if i == len(self.prices):
+            return 0
+        return (self.cumulative[-1] - (self.cumulative[i - 1] if i > 0 else 0)) / self.scale
+
+    def levels_above(self, price):
+        # (price, volume) of the levels strictly above `price`, the highest price first
+        i = bisect_right(self.prices, price)
+        return [(level, self.volumes[level] / self.scale) for level in reversed(self.prices[i:])]
+
+    def levels_below(self, price):
+        # (price, volume) of the levels strictly below `price`, the lowest price first
+        i = bisect_left(self.prices, price)
+        return [(level, self.volumes[level] / self.scale) for level in self.prices[:i]]
 
 
 class Trader:
     # Creating a class attribute to store all the data we receive; populated iteratively
     df_data_market = pd.DataFrame()
+    # (symbol, column of df_data_market, e.g. "bid_2") -> PriceLevelHistogram of that level of the book
+    level_histograms = {}
 
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
         # Initialize the method output dict as an empty dict
@@ -25,22 +98,18 @@ class Trader:
             # We look at every buy order in the order book that is higher than any past sell order (since we know
             # current O.B. can't be crossed)
             if len(order_depth.sell_orders) != 0 and len(self.df_data_market) > 0:
-                # We get the appropriate past orders
-                mask_symbol = self.df_data_market["symbol"] == symbol
-                df_past_orders = self.df_data_market[mask_symbol]
-
                 # First loooking at the most attractive order we can profit from
                 lowest_ask = min(order_depth.sell_orders.keys())
                 volume_lowest_ask = order_depth.sell_orders.get(lowest_ask)
 
                 # First looking for the most competitive orders
-                orders_1 = self.get_opportunities_for_price(symbol, df_past_orders, lowest_ask, volume_lowest_ask, 1, "SELL")
-                orders_2 = self.get_opportunities_for_price(symbol, df_past_orders, lowest_ask, volume_lowest_ask, 2, "SELL")
-                orders_3 = self.get_opportunities_for_price(symbol, df_past_orders, lowest_ask, volume_lowest_ask, 3, "SELL")
+                orders_1 = self.get_opportunities_for_price(symbol, lowest_ask, volume_lowest_ask, 1, "SELL")
+                orders_2 = self.get_opportunities_for_price(symbol, lowest_ask, volume_lowest_ask, 2, "SELL")
+                orders_3 = self.get_opportunities_for_price(symbol, lowest_ask, volume_lowest_ask, 3, "SELL")
 
-                orders_4 = self.get_opportunities_for_price(symbol, df_past_orders, lowest_ask, volume_lowest_ask, 1, "BUY")
-                orders_5 = self.get_opportunities_for_price(symbol, df_past_orders, lowest_ask, volume_lowest_ask, 2, "BUY")
-                orders_6 = self.get_opportunities_for_price(symbol, df_past_orders, lowest_ask, volume_lowest_ask, 3, "BUY")
+                orders_4 = self.get_opportunities_for_price(symbol, lowest_ask, volume_lowest_ask, 1, "BUY")
+                orders_5 = self.get_opportunities_for_price(symbol, lowest_ask, volume_lowest_ask, 2, "BUY")
+                orders_6 = self.get_opportunities_for_price(symbol, lowest_ask, volume_lowest_ask, 3, "BUY")
 
                 print(orders_1)
 
@@ -48,29 +117,28 @@ class Trader:
         return result
 
 
-    def get_opportunities_for_price(self, symbol, df_past_orders, price_level, volume_price_level, level_order_book: int, side: str):
+    def get_opportunities_for_price(self, symbol, price_level, volume_price_level, level_order_book: int, side: str):
+        # The past orders of a level of the book come aggregated by price, from the histograms of store_data_market
 
         if side == "SELL":
             price_level_ob = "bid_" + str(level_order_book)
-            volume_level_ob = "vol_bid_" + str(level_order_book)
-            mask_opportunities = df_past_orders[price_level_ob] > price_level
-            df_opportunities = df_past_orders[mask_opportunities]
-            if len(df_opportunities) > 0:
+            histogram = self.level_histograms.get((symbol, price_level_ob))
+            opportunities = histogram.levels_above(price_level) if histogram is not None else []
+            if len(opportunities) > 0:
                 # Then we send orders by most attractive opportunities
-                buy_order_prices = df_opportunities[price_level_ob].to_list()
-                volume_prices = [max (vol, volume_price_level) for vol in df_opportunities[volume_level_ob].to_list()]
+                buy_order_prices = [price for price, _ in opportunities]
+                volume_prices = [max(vol, volume_price_level) for _, vol in opportunities]
                 orders = self.send_bulk_sell_orders(symbol, buy_order_prices, volume_prices)
                 return orders
         # Shayan: trying to mirror the buy part based on what Alban has done so far
         if side == "BUY":
             price_level_ob = "ask_" + str(level_order_book)
-            volume_level_ob = "vol_ask_" + str(level_order_book)
-            mask_opportunities = df_past_orders[price_level_ob] < price_level
-            df_opportunities = df_past_orders[mask_opportunities]
-            if len(df_opportunities) > 0:
+            histogram = self.level_histograms.get((symbol, price_level_ob))
+            opportunities = histogram.levels_below(price_level) if histogram is not None else []
+            if len(opportunities) > 0:
                 # Then we send orders by most attractive opportunities
-                sell_order_prices = df_opportunities[price_level_ob].to_list()
-                volume_prices = [min(vol, volume_price_level) for vol in df_opportunities[volume_level_ob].to_list()]
+                sell_order_prices = [price for price, _ in opportunities]
+                volume_prices = [min(vol, volume_price_level) for _, vol in opportunities]
                 orders = self.send_bulk_buy_orders(symbol, sell_order_prices, volume_prices)
                 return orders
 
@@ -127,6 +195,14 @@ class Trader:
             self.df_data_market = pd.concat([self.df_data_market, pd.DataFrame(row)])
             # print(self.df.tail())
 
+            # And each level of the book to its histogram
+            for price_column, price, volume in (("bid_1", bid_1, volume_bid_1), ("bid_2", bid_2, volume_bid_2),
+                                                ("bid_3", bid_3, volume_bid_3), ("ask_1", ask_1, volume_ask_1),
+                                                ("ask_2", ask_2, volume_ask_2), ("ask_3", ask_3, volume_ask_3)):
+                if (symbol, price_column) not in self.level_histograms:
+                    self.level_histograms[(symbol, price_column)] = PriceLevelHistogram()
+                self.level_histograms[(symbol, price_column)].add_snapshot([(price, volume)])
+
         except Exception as e:  # Could happen if nothing in the order book for one side/both sides
             print(e)
 
@@ -3,9 +3,61 @@ import pandas as pd
 import numpy as np
 import statistics as stat
 import math as mt
+from collections import deque
 from datamodel import OrderDepth, TradingState, Order
 
 
+class LotQueue:
+    # Open position of one symbol as a queue of (price, quantity) lots, all on the side of the position. A fill that
+    # goes against the position is matched against whole lots, so its cost is the number of lots it touches rather
+    # than its quantity. "lifo" matches the most recent lot first, "fifo" the oldest one, and "average" keeps a single
+    # lot at the average entry price
+    def __init__(self, accounting: str = "lifo"):
+        if accounting not in ("lifo", "fifo", "average"):
+            raise ValueError("Unknown accounting: " + str(accounting))
+        self.accounting = accounting
+        self.lots = deque()  # [price, remaining quantity]
+        self.position = 0
+        self.realized_pnl = 0
+
+    def fill(self, price, quantity: int):
+        # quantity > 0 for a buy, < 0 for a sell; returns the PnL realized by this fill
+        direction = 1 if quantity > 0 else -1
+        remaining = abs(quantity)
+        realized = 0
+        while remaining > 0 and self.position * direction < 0:
+            lot = self.lots[-1] if self.accounting == "lifo" else self.lots[0]
+            matched = min(remaining, lot[1])
+            # long and selling: price - entry; short and buying: entry - price
+            realized += (lot[0] - price) * matched * direction
+            lot[1] -= matched
+            remaining -= matched
+            self.position += direction * matched
+            if lot[1] == 0:
+                if self.accounting == "lifo":
+                    self.lots.pop()
+                else:
+                    self.lots.popleft()
+        if remaining > 0:
+            if self.accounting == "average" and self.lots:
+                lot = self.lots[0]
+                lot[0] = (lot[0] * lot[1] + price * remaining) / (lot[1] + remaining)
+                lot[1] += remaining
+            else:
+                self.lots.append([price, remaining])
+            self.position += direction * remaining
+        self.realized_pnl += realized
+        return realized
+
+    def average_price(self):
+        if self.position == 0:
+            return np.nan
+        return sum(price * quantity for price, quantity in self.lots) / abs(self.position)
+
+    def unrealized_pnl(self, mark_price):
+        return sum((mark_price - price) * quantity for price, quantity in self.lots) * (1 if self.position > 0 else -1)
+
+
 class Trader:
     # Creating a class attribute to store all the data we receive; populated iteratively
     df_data_market = pd.DataFrame()
@@ -16,7 +68,8 @@ class Trader:
     #---------------------------------------------
     positions = {"PEARLS": 0, "BANANAS": 0}
     seashells = 0
-    prices = {"PEARLS": [], "BANANAS": []}
+    accounting = "lifo"  # how our fills are matched to compute the seashells: "lifo", "fifo" or "average"
+    lots = None  # symbol -> LotQueue of our open position, built from accounting on the first call to run
     #---------------------------------------------
 
     # Defining the position limits
@@ -26,6 +79,9 @@ class Trader:
         """"""
         # Initialize the method output dict as an empty dict
         result = {}
+        if self.lots is None:
+            # Built here rather than with the class, so that each Trader gets its own queues with its own accounting
+            self.lots = {symbol: LotQueue(self.accounting) for symbol in self.limits}
         if state.own_trades:
             self.process_trades(state)
         # Looping through all the symbols
@@ -67,33 +123,15 @@ class Trader:
                 # check if the trade is a buy or a sell
                 if trade.buyer == "SUBMISSION":
                     print("We bought", trade.quantity, symbol, "at price:", trade.price, "SPENT:", trade.price*trade.quantity)
-                    # we are the buyer: if we are at a non-negative position, we just store the prices in the relative
-                    # price list.
-                    for i in range(trade.quantity):
-                        if self.positions[symbol] >= 0:
-                            self.prices[symbol].append(trade.price)
-                        else:
-                            # if we were at negative position, we match the current buy with the most recent sell 1 by 1
-                            # and we assume the difference as our profit
-                            sold_at_price = self.prices[symbol].pop(-1)
-                            self.seashells += sold_at_price - trade.price
-                        # it's a buy, so we move one forward
-                        self.positions[symbol] += 1
+                    # a buy adds a lot when we are flat or long; when short, it is matched against the lots we sold and
+                    # the difference is our profit
+                    self.seashells += self.lots[symbol].fill(trade.price, trade.quantity)
                 # check if the trade is a sell
                 if trade.seller == "SUBMISSION":
                     print("We sold", trade.quantity, symbol, "at price:", trade.price, "SPENT:", trade.price*trade.quantity)
-                    # we are the seller: if we are at a non-positive position, we just store the prices in the relative
-                    # price list.
-                    for i in range(trade.quantity):
-                        if self.positions[symbol] <= 0:
-                            self.prices[symbol].append(trade.price)
-                        else:
-                            # if we were at a positive position, we match the current sell order with the most recent
-                            # buy 1 by 1 and we assume the difference as our profit
-                            bought_at_price = self.prices[symbol].pop(-1)
-                            self.seashells += trade.price - bought_at_price
-                        # it's a sell, so we move one backward
-                        self.positions[symbol] -= 1
+                    # same thing on the other side: matched against the lots we bought when long
+                    self.seashells += self.lots[symbol].fill(trade.price, -trade.quantity)
+                self.positions[symbol] = self.lots[symbol].position
             print("Calculated position for", symbol, "is:", self.positions[symbol])
         print("We now have", self.seashells, "SEASHELLS")
         print("-------------------^^^^^^^^^^^^^^^^^ done trades ^^^^^^^^^^^^^^^^----------------")
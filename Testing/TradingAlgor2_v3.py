@@ -4,24 +4,162 @@ import numpy as np
 import statistics as stat
 import math as mt
 import json
-from datamodel import Order, ProsperityEncoder, Symbol, TradingState, OrderDepth
+from datamodel import Order, Symbol, TradingState, OrderDepth
 from typing import Any
 
+
 class Logger:
-    def __init__(self) -> None:
-        self.logs = ""
+    # Streams one compact JSON line per tick instead of dumping the whole TradingState:
+    # - order depths are delta encoded against the previous tick ([price, volume] of the levels that changed, volume
+    #   0 for a level that disappeared, null for a book that disappeared), with a full snapshot ("k": 1) and the
+    #   listings every `keyframe_interval` ticks
+    # - the logs are joined at flush, and are truncated so that a line never exceeds `max_length` characters
+    # - when disabled, print and flush return straight away: nothing is formatted or serialized
+    # LogDecoder turns the lines back into the {"state", "orders", "logs"} lines of the previous logger, which the
+    # visualizer reads
+    scalars = (str, int, float, bool, type(None))
+
+    def __init__(self, enabled: bool = True, max_length: int = 3750, keyframe_interval: int = 100,
+                 stream=None) -> None:
+        self.enabled = enabled
+        self.max_length = max_length
+        self.keyframe_interval = keyframe_interval
+        self.stream = stream  # anything with a write method; stdout (what the exchange records) by default
+        self.logs = []
+        self.previous_depths = {}
+        self.ticks = 0
 
     def print(self, *objects: Any, sep: str = " ", end: str = "\n") -> None:
-        self.logs += sep.join(map(str, objects)) + end
+        if self.enabled:
+            # Scalars can't change until the flush and are converted then; the rest (dicts, orders, books) is
+            # converted now, or it would be logged as it is at the end of the tick
+            self.logs.append((tuple(obj if isinstance(obj, self.scalars) else str(obj) for obj in objects), sep, end))
 
     def flush(self, state: TradingState, orders: dict[Symbol, list[Order]]) -> None:
-        print(json.dumps({
-            "state": state,
-            "orders": orders,
-            "logs": self.logs,
-        }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True))
+        if not self.enabled:
+            return
+        keyframe = self.ticks % self.keyframe_interval == 0
+        self.ticks += 1
+
+        line = {"t": state.timestamp,
+                "d": self.encode_depths(state.order_depths, keyframe),
+                "p": state.position,
+                "ob": state.observations,
+                "ot": self.encode_trades(state.own_trades),
+                "mt": self.encode_trades(state.market_trades),
+                "o": {symbol: [[order.price, order.quantity] for order in symbol_orders]
+                      for symbol, symbol_orders in orders.items()}}
+        if keyframe:
+            line["k"] = 1
+            line["li"] = {symbol: [listing.product, listing.denomination] for symbol, listing in state.listings.items()}
+        line["l"] = ""
+        encoded = json.dumps(line, separators=(",", ":"))
+        line["l"] = self.format_logs(self.max_length - len(encoded) + 2)
+        encoded = json.dumps(line, separators=(",", ":"))
+
+        if self.stream is None:
+            print(encoded)
+        else:
+            self.stream.write(encoded + "\n")
+        self.logs = []
+
+    def encode_depths(self, order_depths, keyframe: bool):
+        deltas = {}
+        for symbol, depth in order_depths.items():
+            if keyframe or symbol not in self.previous_depths:
+                previous_buys, previous_sells = {}, {}
+                changed = True  # even an empty book, so that the decoder knows the symbol
+            else:
+                previous_buys, previous_sells = self.previous_depths[symbol]
+                changed = False
+            buys = self.encode_side(depth.buy_orders, previous_buys)
+            sells = self.encode_side(depth.sell_orders, previous_sells)
+            if changed or buys or sells:
+                deltas[symbol] = [buys, sells]
+            self.previous_depths[symbol] = (dict(depth.buy_orders), dict(depth.sell_orders))
+        for symbol in [symbol for symbol in self.previous_depths if symbol not in order_depths]:
+            del self.previous_depths[symbol]
+            if not keyframe:
+                deltas[symbol] = None
+        return deltas
+
+    @staticmethod
+    def encode_side(orders: dict, previous: dict):
+        changes = [[price, volume] for price, volume in orders.items() if previous.get(price) != volume]
+        changes.extend([price, 0] for price in previous if price not in orders)
+        return changes
+
+    @staticmethod
+    def encode_trades(trades):
+        return {symbol: [[trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp]
+                         for trade in symbol_trades or []] for symbol, symbol_trades in trades.items()}
+
+    def format_logs(self, budget: int) -> str:
+        # Formats the logs of the tick, stopping once the budget is spent, then cuts them so that their json encoding
+        # (quotes included) fits in the budget
+        logs = ""
+        for objects, sep, end in self.logs:
+            if len(logs) > budget:
+                break
+            logs += sep.join(map(str, objects)) + end
+        if len(json.dumps(logs)) <= budget:
+            return logs
+        while logs and len(json.dumps(logs + "...")) > budget:
+            logs = logs[:len(logs) - max(1, len(json.dumps(logs + "...")) - budget)]
+        return logs + "..." if logs else ""
+
+
+class LogDecoder:
+    # Rebuilds the ticks written by Logger, in order from a keyframe: decode(line) gives the {"state", "orders",
+    # "logs"} dict the previous logger dumped with ProsperityEncoder, and decode_lines the json lines themselves
+    def __init__(self) -> None:
+        self.depths = {}  # symbol -> (buy_orders, sell_orders) as of the last line
+        self.listings = None
+
+    def decode(self, line: str) -> dict:
+        data = json.loads(line)
+        if data.get("k"):
+            self.depths = {}
+            self.listings = {symbol: {"symbol": symbol, "product": product, "denomination": denomination}
+                             for symbol, (product, denomination) in data["li"].items()}
+        elif self.listings is None:
+            raise ValueError("Logs must be decoded from a keyframe")
+
+        for symbol, delta in data["d"].items():
+            if delta is None:
+                self.depths.pop(symbol, None)
+                continue
+            buys, sells = self.depths.setdefault(symbol, ({}, {}))
+            for side, changes in ((buys, delta[0]), (sells, delta[1])):
+                for price, volume in changes:
+                    if volume == 0:
+                        side.pop(price, None)
+                    else:
+                        side[price] = volume
+
+        state = {"timestamp": data["t"],
+                 "listings": self.listings,
+                 "order_depths": {symbol: {"buy_orders": dict(buys), "sell_orders": dict(sells)}
+                                  for symbol, (buys, sells) in self.depths.items()},
+                 "own_trades": self.decode_trades(data["ot"]),
+                 "market_trades": self.decode_trades(data["mt"]),
+                 "position": data["p"],
+                 "observations": data["ob"]}
+        orders = {symbol: [{"symbol": symbol, "price": price, "quantity": quantity} for price, quantity in rows]
+                  for symbol, rows in data["o"].items()}
+        return {"state": state, "orders": orders, "logs": data["l"]}
+
+    @staticmethod
+    def decode_trades(trades):
+        return {symbol: [{"symbol": symbol, "price": price, "quantity": quantity, "buyer": buyer, "seller": seller,
+                          "timestamp": timestamp} for price, quantity, buyer, seller, timestamp in rows]
+                for symbol, rows in trades.items()}
+
+    def decode_lines(self, lines):
+        for line in lines:
+            if line.strip():
+                yield json.dumps(self.decode(line), separators=(",", ":"), sort_keys=True)
 
-        self.logs = ""
 
 logger = Logger()
 
@@ -67,7 +205,7 @@ class Trader:
 
             # Add all the above orders to the result dict
             result[symbol] = orders
-        logger.flush(state, orders)
+        logger.flush(state, result)
 
         return result
 
@@ -189,7 +327,7 @@ class Trader:
                                 avg_price = total_cost / net_position
                         rows.append({'timestamp': timestamp, 'symbol': symbol, 'price': price, 'qty': qty, 'avg_price':
                             avg_price})
-                        logger.print("Traded " + str(symbol) + " price: ", str(price) + " volume: ", str(qty))
+                        logger.print("Traded", symbol, "price:", price, "volume:", qty)
                 self.df_data_trades = pd.concat([self.df_data_trades, pd.DataFrame(rows)])
                 logger.print(self.df_data_trades.tail())
 
@@ -270,7 +408,7 @@ class Trader:
         # This method gets the fair price using vwap method and then computes the spread based on our current position
 
         #print("Both sides of the market are quoted for " + symbol)
-        logger.print("Position on " + symbol + " is: " + str(current_pos))
+        logger.print("Position on", symbol, "is:", current_pos)
         # Initialize the list of Orders to be sent as an empty list
         orders: list[Order] = []
         order_depth: OrderDepth = state.order_depths[symbol]
@@ -288,15 +426,15 @@ class Trader:
             fair_value_asset = self.get_alternate_sell_price_asset(symbol, state)
 
 
-        logger.print("The estimated fair price for " + symbol + " is: " + str(fair_value_asset))
+        logger.print("The estimated fair price for", symbol, "is:", fair_value_asset)
 
         # Computing the spread & fair prices
         spreads = self.estimate_spreads(symbol, current_pos, position_limit, state)
         buy_spread = spreads["buy_spread"]
         sell_spread = spreads["sell_spread"]
         market_spread = spreads["spread_market"]
-        logger.print("The estimated buy spread for " + symbol + " is: " + str(buy_spread))
-        logger.print("The estimated sell spread for " + symbol + " is: " + str(sell_spread))
+        logger.print("The estimated buy spread for", symbol, "is:", buy_spread)
+        logger.print("The estimated sell spread for", symbol, "is:", sell_spread)
 
         #Estimating a profit range limits
         
@@ -311,12 +449,12 @@ class Trader:
         buy_orders_to_place = [(key, value) for key, value in order_depth.sell_orders.items() if
                                key < fair_buy_price]
         if total_volume_buy != 0:
-            logger.print(str(len(buy_orders_to_place)) + " buy orders to place:")
+            logger.print(len(buy_orders_to_place), "buy orders to place:")
             for buy_order_to_place in buy_orders_to_place:
                 buy_price = buy_order_to_place[0]
                 buy_volume = - buy_order_to_place[1]
                 orders.append(Order(symbol, buy_price, buy_volume))
-                logger.print("BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                logger.print("BUY", symbol, "price:", buy_price, "volume:", buy_volume)
    
 
         #Trying to account for outliers
@@ -340,12 +478,12 @@ class Trader:
         sell_orders_to_place = [(key, value) for key, value in order_depth.buy_orders.items() if
                                 key > fair_sell_price]
         if total_volume_sell != 0:
-            logger.print(str(len(sell_orders_to_place)) + " sell orders to place:")
+            logger.print(len(sell_orders_to_place), "sell orders to place:")
             for sell_order_to_place in sell_orders_to_place:
                 price = sell_order_to_place[0]
                 volume = - sell_order_to_place[1]
                 orders.append(Order(symbol, price, volume))
-                logger.print("SELL " + str(symbol) + " price: ", str(price) + " volume: ", str(volume))
+                logger.print("SELL", symbol, "price:", price, "volume:", volume)
         
 
         # if buy_spread > market_spread:
@@ -385,26 +523,26 @@ class Trader:
                 buy_price = mt.floor(fair_value_asset) - 1
                 buy_volume = mt.floor((position_limit - current_pos) / 4)
                 orders.append(Order(symbol, buy_price, buy_volume))
-                logger.print("Trying to BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                logger.print("Trying to BUY", symbol, "price:", buy_price, "volume:", buy_volume)
                 
             elif sell_spread < market_spread:
                 sell_price = mt.ceil(fair_value_asset) + 1
                 sell_volume = - mt.floor((position_limit + current_pos) / 4)
                 orders.append(Order(symbol, sell_price, sell_volume))
-                logger.print("Trying to SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                logger.print("Trying to SELL", symbol, "price:", sell_price, "volume:", sell_volume)
         elif current_pos > position_limit + 5:
             if sell_spread < market_spread:
                 sell_price = mt.ceil(fair_value_asset) + 1
                 sell_volume = - mt.floor((position_limit + current_pos) / 4)
                 orders.append(Order(symbol, sell_price, sell_volume))
-                logger.print("Trying to SELL " + str(symbol) + " price: ", str(sell_price) + " volume: ", str(sell_volume))
+                logger.print("Trying to SELL", symbol, "price:", sell_price, "volume:", sell_volume)
             elif buy_spread < market_spread:
                 buy_price = mt.floor(fair_value_asset) - 1
                 buy_volume = mt.floor((position_limit - current_pos) / 4)
                 orders.append(Order(symbol, buy_price, buy_volume))
-                logger.print("Trying to BUY " + str(symbol) + " price: ", str(buy_price) + " volume: ", str(buy_volume))
+                logger.print("Trying to BUY", symbol, "price:", buy_price, "volume:", buy_volume)
         else:
-            logger.print("Position limit of " + str(position_limit) + " for " + str(symbol) + " has been reached. No more orders will be placed.")        
+            logger.print("Position limit of", position_limit, "for", symbol, "has been reached. No more orders will be placed.")        
 
 
         return orders
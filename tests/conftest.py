@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The Trader files import the exchange datamodel, of which Backtest/ holds a copy, and the tests load them with the
+# replay tools of Backtest/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backtest"))
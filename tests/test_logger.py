@@ -0,0 +1,84 @@
+import importlib.util
+import io
+import json
+import os
+
+from datamodel import Listing, Order, OrderDepth, ProsperityEncoder, Trade, TradingState
+
+PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Testing", "TradingAlgor2_v3.py")
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("trading_algor2_v3", PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def depth(buys, sells):
+    order_depth = OrderDepth()
+    order_depth.buy_orders = dict(buys)
+    order_depth.sell_orders = dict(sells)
+    return order_depth
+
+
+def ticks():
+    # Levels that change, disappear and come back, a book that disappears, a symbol listed with an empty book
+    listings = {symbol: Listing(symbol, symbol, "SEASHELLS") for symbol in ("PEARLS", "BANANAS")}
+    books = [{"PEARLS": depth({9998: 5, 9996: 10}, {10002: -5}), "BANANAS": depth({4990: 3}, {4995: -2, 4996: -8})},
+             {"PEARLS": depth({9998: 7, 9996: 10}, {10002: -5}), "BANANAS": depth({4990: 3}, {4996: -8})},
+             {"PEARLS": depth({9996: 10}, {10002: -5, 10004: -1})},
+             {"PEARLS": depth({9996: 10}, {10002: -5, 10004: -1}), "BANANAS": depth({}, {})},
+             {"PEARLS": depth({9999: 1}, {10001: -1}), "BANANAS": depth({4990: 3}, {4995: -2})},
+             {"PEARLS": depth({9999: 2}, {10001: -1}), "BANANAS": depth({4990: 3}, {4995: -2})}]
+    for i, order_depths in enumerate(books):
+        timestamp = 100 * i
+        own_trades = {"PEARLS": [Trade("PEARLS", 10002, 2, "SUBMISSION", "", timestamp - 100)] if i % 2 else []}
+        market_trades = {"BANANAS": [Trade("BANANAS", 4993, 1, "", "", timestamp - 100)]} if i % 3 == 1 else {}
+        state = TradingState(timestamp, listings, order_depths, own_trades, market_trades, {"PEARLS": 2 * i}, {})
+        orders = {"PEARLS": [Order("PEARLS", 9997, 3), Order("PEARLS", 10003, -3)], "BANANAS": []}
+        yield state, orders, "tick " + str(i)
+
+
+def test_decoded_lines_match_the_full_state_dump():
+    module = load_module()
+    stream = io.StringIO()
+    logger = module.Logger(stream=stream, keyframe_interval=4)
+    expected = []
+    for state, orders, log in ticks():
+        logger.print(log)
+        logger.flush(state, orders)
+        expected.append(json.dumps({"state": state, "orders": orders, "logs": log + "\n"}, cls=ProsperityEncoder,
+                                   separators=(",", ":"), sort_keys=True))
+    decoded = list(module.LogDecoder().decode_lines(stream.getvalue().splitlines()))
+    assert decoded == expected
+
+
+def test_decoding_needs_a_keyframe():
+    module = load_module()
+    stream = io.StringIO()
+    logger = module.Logger(stream=stream, keyframe_interval=4)
+    for state, orders, log in ticks():
+        logger.flush(state, orders)
+    lines = stream.getvalue().splitlines()
+    decoder = module.LogDecoder()
+    try:
+        decoder.decode(lines[1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("A delta line should not decode without its keyframe")
+    # Starting from the second keyframe gives the same ticks as decoding from the start
+    assert list(decoder.decode_lines(lines[4:])) == list(module.LogDecoder().decode_lines(lines))[4:]
+
+
+def test_print_logs_mutable_objects_as_they_were_printed():
+    module = load_module()
+    stream = io.StringIO()
+    logger = module.Logger(stream=stream)
+    position = {"PEARLS": 1}
+    logger.print("Position:", position, 3)
+    position["PEARLS"] = 5
+    state, orders, _ = next(ticks())
+    logger.flush(state, orders)
+    assert json.loads(stream.getvalue())["l"] == "Position: {'PEARLS': 1} 3\n"
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import random
+
+import pytest
+
+ALBAN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Testing", "Alban")
+
+
+def load_histogram(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ALBAN, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.PriceLevelHistogram
+
+
+@pytest.fixture(params=["jacob_algo", "jacob_algo_bis"])
+def histogram_class(request):
+    return load_histogram(request.param)
+
+
+def test_window_and_decay_survive_the_rescale(histogram_class):
+    # A decay of 0.5 rescales the volumes every ~330 snapshots: the expired snapshots must be taken out at the scale
+    # of the volumes they were added to
+    rng = random.Random(0)
+    histogram = histogram_class(decay=0.5, window=5)
+    snapshots = []
+    for t in range(1000):
+        levels = list(dict((rng.randint(95, 105), rng.randint(1, 10)) for i in range(2)).items())
+        histogram.add_snapshot(levels)
+        snapshots.append(levels)
+    expected = {}
+    for age, levels in enumerate(reversed(snapshots[-5:])):
+        for price, volume in levels:
+            expected[price] = expected.get(price, 0) + volume * 0.5 ** age
+    assert histogram.prices == sorted(expected)
+    for price, volume in expected.items():
+        assert histogram.volume(price) == pytest.approx(volume)
+
+
+def test_expired_levels_leave_the_histogram(histogram_class):
+    histogram = histogram_class(window=2)
+    histogram.add_snapshot([(100, 5), (101, 3)])
+    histogram.add_snapshot([(100, 1)])
+    histogram.add_snapshot([(102, 2)])
+    assert histogram.prices == [100, 102]
+    assert histogram.levels_above(99) == [(102, 2), (100, 1)]
+    assert histogram.levels_below(103) == [(100, 1), (102, 2)]
+    assert histogram.volume_above(99) == 3
@@ -0,0 +1,26 @@
+import importlib.util
+import math
+import os
+
+import pytest
+
+ROUND_2 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Round_2", "Testing",
+                       "round2_cosebase_v1.py")
+
+
+def load_engine():
+    spec = importlib.util.spec_from_file_location("round2_cosebase_v1", ROUND_2)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.EwmaEngine
+
+
+@pytest.mark.filterwarnings("error")  # 0 / 0 is nan as well, but only after a RuntimeWarning
+def test_late_span_has_no_bias_corrected_mean_before_its_first_value():
+    engine = load_engine()({"PEARLS": [10]})
+    for value in (10000, 10002, 9998):
+        engine.update("PEARLS", value)
+    engine.subscribe("PEARLS", [50])
+    assert math.isnan(engine.mean("PEARLS", 50, bias_corrected=True))
+    engine.update("PEARLS", 10004)
+    assert engine.mean("PEARLS", 50, bias_corrected=True) == pytest.approx(10004)
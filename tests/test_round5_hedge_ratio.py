@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from backtester import load_trader
+
+ROUND_5 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Round_5", "Final",
+                       "Round5PerBana.py")
+
+
+def coconuts(seed, ticks=10000):
+    # Mid prices around 8000 moving like COCONUTS (about 1.4 per tick), and the noise of PINA_COLADAS around its fit
+    rng = np.random.default_rng(seed)
+    return 8000 + np.cumsum(rng.normal(0, 1.4, ticks)), rng.normal(0, 2, ticks)
+
+
+def replay(hedge, x, y):
+    betas = []
+    for t in range(len(x)):
+        hedge.update(100 * t, x[t], y[t])
+        betas.append(hedge.beta)
+    return betas
+
+
+def test_beta_converges_to_the_slope_despite_an_intercept():
+    hedge = type(load_trader(ROUND_5).coco_pina_hedge)()
+    x, noise = coconuts(0)
+    betas = replay(hedge, x, 1.8 * x + 500 + noise)
+    # The ratio of the first prices is about 1.8625: the intercept must not be absorbed by beta
+    assert abs(1.8 - (1.8 * x[0] + 500 + noise[0]) / x[0]) > 0.05
+    assert abs(betas[-1] - 1.8) < 0.005
+    assert abs(hedge.alpha - 500) < 50
+    assert abs(hedge.z_score()) < 4
+
+
+def test_beta_follows_a_change_of_slope():
+    hedge = type(load_trader(ROUND_5).coco_pina_hedge)()
+    x, noise = coconuts(0)
+    slope = np.where(np.arange(len(x)) < len(x) // 2, 1.875, 1.9)
+    betas = replay(hedge, x, slope * x + 500 + noise)
+    assert abs(betas[len(x) // 2 - 1] - 1.875) < 0.005
+    assert abs(betas[-1] - 1.9) < 0.01
+    # The change goes to beta rather than to the intercept
+    assert abs(hedge.alpha - 500) < 100
+
+
+def test_no_z_score_before_the_warmup_fit():
+    hedge = type(load_trader(ROUND_5).coco_pina_hedge)(warmup=50)
+    x, noise = coconuts(1, 60)
+    for t in range(50):
+        hedge.update(100 * t, x[t], 1.8 * x[t] + 500 + noise[t])
+        assert np.isnan(hedge.z_score())
+    hedge.update(5000, x[50], 1.8 * x[50] + 500 + noise[50])
+    assert not np.isnan(hedge.z_score())
@@ -0,0 +1,45 @@
+import os
+
+from backtester import load_trader
+from datamodel import Order, TradingState
+
+ROUND_5 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Round_5", "Final",
+                       "Round5PerBana.py")
+
+
+def state_with_position(symbol, position):
+    return TradingState(0, {}, {}, {}, {}, {symbol: position}, {})
+
+
+def volumes(orders):
+    return {order.price: order.quantity for order in orders}
+
+
+def test_buy_surplus_trims_the_furthest_from_fair_value_first():
+    trader = load_trader(ROUND_5)
+    orders = [Order("COCONUTS", 7990, 4), Order("COCONUTS", 7999, 3), Order("COCONUTS", 7980, 2)]
+    # 596 + 9 is 5 over the limit of 600: the 2 lots at 7980 go, then 3 of the 4 at 7990
+    trimmed = trader.trim_orders("COCONUTS", state_with_position("COCONUTS", 596), orders, fair_value=8000)
+    assert volumes(trimmed) == {7990: 1, 7999: 3}
+
+
+def test_sell_surplus_trims_the_furthest_from_fair_value_first():
+    trader = load_trader(ROUND_5)
+    orders = [Order("PINA_COLADAS", 15010, -2), Order("PINA_COLADAS", 15001, -5), Order("PINA_COLADAS", 15030, -1)]
+    trimmed = trader.trim_orders("PINA_COLADAS", state_with_position("PINA_COLADAS", -296), orders, fair_value=15000)
+    assert volumes(trimmed) == {15001: -4}
+
+
+def test_surplus_without_fair_value_trims_the_biggest_orders_first():
+    trader = load_trader(ROUND_5)
+    orders = [Order("COCONUTS", 7990, 4), Order("COCONUTS", 7999, 3), Order("COCONUTS", 7980, 2)]
+    trimmed = trader.trim_orders("COCONUTS", state_with_position("COCONUTS", 596), orders)
+    assert volumes(trimmed) == {7999: 2, 7980: 2}
+
+
+def test_handlers_trim_around_the_fair_value_of_the_strategy():
+    trader = load_trader(ROUND_5)
+    orders = [Order("COCONUTS", 7990, 4), Order("COCONUTS", 7999, 3), Order("COCONUTS", 7980, 2)]
+    trader.get_orders_coco_pina = lambda symbol, state, current_pos, position_limit: (orders, 8000)
+    result = trader.handle_coco_pina("COCONUTS", state_with_position("COCONUTS", 596))
+    assert volumes(result["COCONUTS"]) == {7990: 1, 7999: 3}